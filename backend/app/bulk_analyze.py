@@ -0,0 +1,416 @@
+"""
+Offline bulk analysis of JSONL or CSV corpora, without the HTTP API.
+
+Run from the backend directory:
+
+    python -m app.bulk_analyze messages.jsonl results.jsonl
+    python -m app.bulk_analyze archive.csv results.jsonl --text-field body --id-field message_id --explain
+    python -m app.bulk_analyze archive.csv results.jsonl --resume
+
+Records are streamed in chunks to a pool of worker processes (one per core by
+default), each holding the compiled matcher of the active lexicon
+(LEXICON_PATH). Results are written as JSONL in input order, one line per
+record (or only flagged ones with --flagged-only):
+
+    {"index": 0, "id": "...", "severity_score": 2,
+     "flagged_phrases": [{"phrase": "...", "start_index": 0, "end_index": 19}]}
+
+A record that can't be read (invalid JSON, or not a JSON object) does not stop
+the run; it is written as {"index": 3, "error": "..."} instead. Text fields
+that aren't strings are converted with str().
+
+With --explain, a second phase asks the LLM once per distinct phrase
+(normalized as in the explanation cache) and writes
+{"phrase": ..., "explanation": ...} lines to RESULTS.explanations.jsonl.
+
+A checkpoint (RESULTS.checkpoint.json) records how far input and output have
+got. After an interruption, --resume continues from the last checkpoint:
+the output is cut back to what the checkpoint covers and the input is read
+on from the recorded byte offset. Phrases already explained are skipped.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.models.abusive_language import calculate_severity_score
+from app.models.lexicon import get_lexicon, phrase_info
+from app.models.phrase_matcher import PhraseMatcher
+from app.utils.explanation_cache import normalize_phrase
+
+# Bumped when the checkpoint layout changes
+CHECKPOINT_FORMAT = 1
+
+# (index, id, text, error) of one input record; error is set (and text
+# empty) for a record that could not be read
+Record = Tuple[int, Any, str, Optional[str]]
+
+
+def _read_lines(f: BinaryIO, position: List[int]) -> Iterator[str]:
+    """
+    Decoded lines of a binary file; position[0] is kept at the byte offset
+    after the last line handed out
+    """
+    for line in f:
+        position[0] += len(line)
+        yield line.decode("utf-8", errors="replace")
+
+
+def _as_text(value: Any) -> str:
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+def iter_records(
+    f: BinaryIO,
+    input_format: str,
+    text_field: str,
+    id_field: Optional[str],
+    position: List[int],
+    start_index: int = 0,
+    header: Optional[List[str]] = None,
+) -> Iterator[Record]:
+    """
+    Records of a JSONL or CSV file opened in binary mode, read lazily.
+    position[0] is the byte offset just after the last record yielded, so a
+    later run can seek there and go on. CSV files opened at an offset need
+    the header read from the start of the file.
+    """
+    lines = _read_lines(f, position)
+    index = start_index
+    if input_format == "jsonl":
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield index, None, "", f"invalid JSON: {e}"
+            else:
+                if isinstance(record, dict):
+                    yield index, record.get(id_field) if id_field else None, _as_text(record.get(text_field)), None
+                else:
+                    yield index, None, "", f"record is a JSON {type(record).__name__}, not an object"
+            index += 1
+        return
+
+    # The csv module pulls exactly the lines of one record (quoted fields
+    # may span several), so position stays on a record boundary
+    reader = csv.reader(lines)
+    if header is None:
+        header = next(reader, [])
+    if text_field not in header:
+        raise ValueError(f"CSV has no column {text_field!r} (columns: {', '.join(header)})")
+    text_column = header.index(text_field)
+    id_column = header.index(id_field) if id_field and id_field in header else None
+    for row in reader:
+        if not row:
+            continue
+        text = row[text_column] if text_column < len(row) else ""
+        yield index, row[id_column] if id_column is not None and id_column < len(row) else None, text, None
+        index += 1
+
+
+def read_csv_header(path: str) -> Tuple[List[str], int]:
+    """
+    Column names of a CSV file and the byte offset where its records start
+    """
+    position = [0]
+    with open(path, "rb") as f:
+        header = next(csv.reader(_read_lines(f, position)), [])
+    return header, position[0]
+
+
+# Matcher and base severities loaded into each worker process by _init_worker
+_worker_matcher: Optional[PhraseMatcher] = None
+_worker_severities: List[Optional[int]] = []
+
+
+def _init_worker(state: Tuple[Any, ...], severities: List[Optional[int]]) -> None:
+    global _worker_matcher, _worker_severities
+    _worker_matcher = PhraseMatcher.from_state(state)
+    _worker_severities = severities
+
+
+def match_chunk(
+    records: List[Record],
+    matcher: Optional[PhraseMatcher] = None,
+    severities: Optional[List[Optional[int]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Result of analyze_text (without the echoed text) for every record
+    """
+    matcher = matcher or _worker_matcher
+    severities = _worker_severities if severities is None else severities
+    results = []
+    for index, record_id, text, error in records:
+        if error is not None:
+            results.append({"index": index, "error": error})
+            continue
+        phrases = [
+            phrase_info(text, start, end, severities[phrase_index])
+            for start, end, phrase_index in matcher.find_all(text)
+        ]
+        result = {"index": index, "severity_score": calculate_severity_score(phrases), "flagged_phrases": phrases}
+        if record_id is not None:
+            result["id"] = record_id
+        results.append(result)
+    return results
+
+
+def _chunks(records: Iterator[Record], size: int, position: List[int]) -> Iterator[Tuple[List[Record], int]]:
+    """
+    Lists of up to size records, each with the input offset just after it
+    """
+    chunk: List[Record] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk, position[0]
+            chunk = []
+    if chunk:
+        yield chunk, position[0]
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class BulkRun:
+    """
+    One matching run over an input file, with the state a checkpoint saves
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.input_format = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+        self.checkpoint_path = args.output + ".checkpoint.json"
+        self.explanations_path = args.output + ".explanations.jsonl"
+        self.records = 0
+        self.flagged = 0
+        self.errors = 0
+        self.input_offset = 0
+        self.output_size = 0
+        self.phrases: Set[str] = set()
+        self.matching_done = False
+
+    def load_checkpoint(self) -> None:
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("format") != CHECKPOINT_FORMAT:
+            raise ValueError(f"{self.checkpoint_path} was written by an incompatible version")
+        if checkpoint["input"] != os.path.abspath(self.args.input) or checkpoint["input_format"] != self.input_format:
+            raise ValueError(f"{self.checkpoint_path} belongs to a run over {checkpoint['input']}")
+        self.records = checkpoint["records"]
+        self.flagged = checkpoint["flagged"]
+        self.errors = checkpoint.get("errors", 0)
+        self.input_offset = checkpoint["input_offset"]
+        self.output_size = checkpoint["output_size"]
+        self.phrases = set(checkpoint["phrases"])
+        self.matching_done = checkpoint["matching_done"]
+        if checkpoint.get("lexicon_version") != get_lexicon().version:
+            print("Warning: the lexicon changed since the checkpoint; earlier records were matched with the old one", file=sys.stderr)
+
+    def save_checkpoint(self) -> None:
+        _write_json_atomic(self.checkpoint_path, {
+            "format": CHECKPOINT_FORMAT,
+            "input": os.path.abspath(self.args.input),
+            "input_format": self.input_format,
+            "lexicon_version": get_lexicon().version,
+            "records": self.records,
+            "flagged": self.flagged,
+            "errors": self.errors,
+            "input_offset": self.input_offset,
+            "output_size": self.output_size,
+            "phrases": sorted(self.phrases),
+            "matching_done": self.matching_done,
+            "saved_at": time.time()
+        })
+
+    def match(self) -> None:
+        """
+        Phase 1: match every record and write the results in input order
+        """
+        args = self.args
+        lexicon = get_lexicon()
+        header = None
+        if self.input_format == "csv":
+            header, records_start = read_csv_header(args.input)
+            self.input_offset = max(self.input_offset, records_start)
+
+        # Cut off anything written after the last checkpoint; those records are redone
+        mode = "r+b" if self.output_size else "wb"
+        if self.output_size and os.path.getsize(args.output) < self.output_size:
+            raise ValueError(f"{args.output} is shorter than its checkpoint says")
+
+        workers = (os.cpu_count() or 1) if args.workers is None else args.workers
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(lexicon.matcher.to_state(), lexicon.severities)) if workers > 0 else None
+        pending: Deque[Tuple[Future, int]] = deque()
+        started = time.perf_counter()
+        last_checkpoint = started
+        records_at_start = self.records
+
+        with open(args.input, "rb") as source, open(args.output, mode) as out:
+            out.seek(self.output_size)
+            out.truncate()
+            source.seek(self.input_offset)
+            position = [self.input_offset]
+            records = iter_records(source, self.input_format, args.text_field, args.id_field, position, self.records, header)
+
+            def write_next() -> None:
+                future, offset = pending.popleft()
+                results = future.result()
+                for result in results:
+                    if "error" in result:
+                        # Always written, so every unreadable record can be found
+                        self.errors += 1
+                    elif result["flagged_phrases"]:
+                        self.flagged += 1
+                        self.phrases.update(normalize_phrase(item["phrase"]) for item in result["flagged_phrases"])
+                    elif args.flagged_only:
+                        continue
+                    out.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.records += len(results)
+                self.input_offset = offset
+
+            try:
+                for chunk, offset in _chunks(records, args.chunk_size, position):
+                    if pool is None:
+                        done: Future = Future()
+                        done.set_result(match_chunk(chunk, lexicon.matcher, lexicon.severities))
+                        pending.append((done, offset))
+                    else:
+                        pending.append((pool.submit(match_chunk, chunk), offset))
+                    # Keep every worker busy, but only a few chunks in memory
+                    while len(pending) > 2 * max(1, workers) or (pending and pending[0][0].done()):
+                        write_next()
+
+                    now = time.perf_counter()
+                    if now - last_checkpoint >= args.checkpoint_seconds:
+                        out.flush()
+                        os.fsync(out.fileno())
+                        self.output_size = out.tell()
+                        self.save_checkpoint()
+                        last_checkpoint = now
+                        rate = (self.records - records_at_start) / (now - started)
+                        print(f"{self.records} records, {self.flagged} flagged ({rate:.0f} records/s)", file=sys.stderr)
+                while pending:
+                    write_next()
+            finally:
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+
+            out.flush()
+            os.fsync(out.fileno())
+            self.output_size = out.tell()
+        self.matching_done = True
+        self.save_checkpoint()
+        elapsed = time.perf_counter() - started
+        print(f"Matched {self.records} records ({self.flagged} flagged, {len(self.phrases)} distinct phrases) "
+              f"in {elapsed:.1f}s", file=sys.stderr)
+        if self.errors:
+            print(f"{self.errors} records could not be read; see the \"error\" lines in {args.output}", file=sys.stderr)
+
+    async def explain(self) -> None:
+        """
+        Phase 2: one explanation per distinct phrase, appended as each
+        completes so an interrupted phase loses nothing already explained
+        """
+        from app.utils.concurrency import as_completed_bounded
+        from app.utils.http_client import close_http_clients
+        from app.utils.llm_scheduler import set_request_lane, BULK, LLM_MAX_CONCURRENCY
+        from app.utils.ollama_helper import get_gpt_explanation, is_fallback, FALLBACK_EXPLANATION
+
+        done: Set[str] = set()
+        if os.path.exists(self.explanations_path):
+            with open(self.explanations_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)["phrase"])
+                    except (ValueError, KeyError):
+                        # A line cut short by the interruption; it is redone
+                        pass
+        todo = sorted(self.phrases - done)
+        print(f"Explaining {len(todo)} phrases ({len(done)} already done)", file=sys.stderr)
+
+        set_request_lane(BULK, "bulk_analyze")
+        failed = 0
+        try:
+            with open(self.explanations_path, "a", encoding="utf-8") as out:
+                async for index, explanation in as_completed_bounded(
+                    todo,
+                    get_gpt_explanation,
+                    fallback=lambda phrase, e: FALLBACK_EXPLANATION,
+                    limit=self.args.explain_concurrency or LLM_MAX_CONCURRENCY
+                ):
+                    # Fallbacks are left out so a later --resume retries them
+                    if is_fallback(explanation):
+                        failed += 1
+                        continue
+                    out.write(json.dumps({"phrase": todo[index], "explanation": explanation}, ensure_ascii=False) + "\n")
+                    out.flush()
+        finally:
+            await close_http_clients()
+        if failed:
+            print(f"{failed} phrases could not be explained; run again with --resume to retry them", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze a JSONL or CSV corpus offline")
+    parser.add_argument("input", help="JSONL (one object per line) or CSV file with a header row")
+    parser.add_argument("output", help="results file (JSONL)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="input format (default: from the file extension)")
+    parser.add_argument("--text-field", default="text", help="field/column holding the message text")
+    parser.add_argument("--id-field", help="field/column copied to the results as \"id\"")
+    parser.add_argument("--workers", type=int, help="matching processes (default: one per core; 0 = in this process)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="records sent to a worker at a time")
+    parser.add_argument("--flagged-only", action="store_true", help="only write records with flagged phrases")
+    parser.add_argument("--explain", action="store_true", help="explain each distinct phrase with the LLM afterwards")
+    parser.add_argument("--explain-concurrency", type=int, help="LLM calls in flight (default: LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--checkpoint-seconds", type=float, default=30, help="how often to save a checkpoint")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of an earlier run")
+    args = parser.parse_args(argv)
+
+    run = BulkRun(args)
+    if args.resume:
+        if not os.path.exists(run.checkpoint_path):
+            print(f"No checkpoint at {run.checkpoint_path}; starting from the beginning", file=sys.stderr)
+        else:
+            try:
+                run.load_checkpoint()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Cannot resume: {e}", file=sys.stderr)
+                return 1
+            print(f"Resuming after {run.records} records", file=sys.stderr)
+    elif os.path.exists(run.checkpoint_path):
+        print(f"{run.checkpoint_path} exists; pass --resume to continue that run, or delete it", file=sys.stderr)
+        return 1
+
+    try:
+        if not run.matching_done:
+            run.match()
+        if args.explain:
+            asyncio.run(run.explain())
+    except KeyboardInterrupt:
+        print("Interrupted; run again with --resume to continue", file=sys.stderr)
+        return 130
+    except (OSError, ValueError) as e:
+        print(f"Bulk analysis failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
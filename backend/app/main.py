@@ -1,25 +1,109 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+import time
+
+# Start-up import time is measured from here and reported by GET /ready
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 import os
+import json
+import hmac
+import codecs
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-from app.models.abusive_language import analyze_text, get_abusive_phrases
-from app.utils.ollama_helper import get_gpt_explanation
+from app.models.abusive_language import analyze_text, calculate_severity_score
+from app.models.lexicon import get_lexicon, reload_lexicon, watch_lexicon
+from app.models.prescreen import get_prescreen_model
+from app.models.edit_session import session_store, SessionLimitError
+from app.utils.ollama_helper import get_gpt_explanation, stream_gpt_explanation, get_document_explanations, is_fallback, FALLBACK_EXPLANATION, PROMPT_VERSION
+from app.utils.concurrency import gather_bounded, as_completed_bounded
+from app.utils.http_client import close_http_clients
+from app.utils.llm_provider import get_provider, start_request_deadline
+from app.utils.llm_scheduler import llm_scheduler, set_request_lane, BULK, INTERACTIVE, LANES
+from app.utils.match_pool import match_pool, MatchPoolFullError
+from app.utils.explanation_cache import explanation_cache, normalize_phrase
+from app.utils.response_cache import response_cache, response_cache_key, etag_for, etag_matches
+from app.utils.response_format import negotiate_format, build_compact_response, encode_compact
+from app.utils.warmup import warm_up, readiness
+from app.utils.metrics import (
+    registry, stage_timer, start_request_timings, format_server_timing,
+    REQUEST_LATENCY, FLAGGED_PHRASES, REJECTED_REQUESTS
+)
 
 # Load environment variables
 load_dotenv()
 
+readiness.import_seconds = time.perf_counter() - _IMPORT_STARTED
+
+# Limits for /analyze/batch
+BATCH_MAX_TEXTS = int(os.getenv("BATCH_MAX_TEXTS", 100))
+BATCH_MAX_TEXT_LENGTH = int(os.getenv("BATCH_MAX_TEXT_LENGTH", 100_000))
+
+# Longest text accepted by /analyze and /analyze/stream (larger ones get 413;
+# use /analyze/file for very large inputs)
+MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", 1_000_000))
+
+# POST /lexicon/reload requires this value in the X-Admin-Token header; while
+# it is empty the endpoint is disabled (a reload recompiles the whole lexicon)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Bytes read per chunk by /analyze/file
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# Largest file accepted by /analyze/file, in bytes (larger ones get 413)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+
+# How /analyze explains phrases: "per_phrase" (one LLM call per phrase) or
+# "document" (one structured call per document); overridable with ?mode=
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE", "per_phrase")
+
+# Endpoints whose LLM calls go to the scheduler's bulk lane (other requests
+# are interactive unless they send X-Priority: bulk)
+BULK_PATHS = ("/analyze/batch", "/analyze/file")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile (or load the snapshot of) the lexicon before taking traffic
+    get_lexicon()
+    print(f"Imported the application in {readiness.import_seconds:.2f}s")
+    watcher = asyncio.create_task(watch_lexicon())
+    # Serve /health right away; /ready turns ready once warm-up is done
+    warmup = asyncio.create_task(warm_up())
+    # The pooled HTTP clients are created lazily on first use; make sure they
+    # are closed cleanly when the worker shuts down
+    yield
+    watcher.cancel()
+    warmup.cancel()
+    match_pool.shutdown()
+    await close_http_clients()
+    explanation_cache.close()
+
 # Create FastAPI app
 app = FastAPI(
     title="SAFESPELL API",
     description="API for detecting abusive, coercive, or manipulative language in text",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def _cors_origins(value: str) -> List[str]:
+    """
+    API_CORS_ORIGINS as a JSON list, or as comma-separated origins
+    """
+    value = value.strip()
+    if value.startswith("["):
+        origins = json.loads(value)
+        if not isinstance(origins, list) or not all(isinstance(origin, str) for origin in origins):
+            raise ValueError("API_CORS_ORIGINS must be a JSON list of strings")
+        return origins
+    return [origin.strip() for origin in value.split(",") if origin.strip()]
+
 # Configure CORS
-origins = eval(os.getenv("API_CORS_ORIGINS", "[\"http://localhost:3000\"]"))
+origins = _cors_origins(os.getenv("API_CORS_ORIGINS", '["http://localhost:3000"]'))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -28,6 +112,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """
+    Record request latency and expose per-stage timings in a Server-Timing header.
+    Also starts the request's LLM latency budget (LLM_REQUEST_BUDGET) and
+    picks its LLM scheduler lane; clients are told apart by X-Client-Id, or
+    else by address.
+    """
+    started = time.perf_counter()
+    timings = start_request_timings()
+    start_request_deadline()
+    bulk = request.url.path in BULK_PATHS or request.headers.get("x-priority", "").lower() == BULK
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "")
+    set_request_lane(BULK if bulk else INTERACTIVE, client)
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    REQUEST_LATENCY.observe(elapsed, getattr(route, "path", "unmatched"), str(response.status_code))
+    timings["total"] = elapsed
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    return response
+
+def _explanation_cache_metrics() -> List[str]:
+    stats = explanation_cache.stats()
+    lines = []
+    for name in ("hits", "disk_hits", "coalesced", "misses"):
+        lines.append(f"# TYPE safespell_explanation_cache_{name}_total counter")
+        lines.append(f"safespell_explanation_cache_{name}_total {stats[name]}")
+    lines.append("# TYPE safespell_explanation_cache_entries gauge")
+    lines.append(f"safespell_explanation_cache_entries {stats['entries']}")
+    response_stats = response_cache.stats()
+    for name in ("hits", "misses"):
+        lines.append(f"# TYPE safespell_response_cache_{name}_total counter")
+        lines.append(f"safespell_response_cache_{name}_total {response_stats[name]}")
+    lines.append("# TYPE safespell_response_cache_bytes gauge")
+    lines.append(f"safespell_response_cache_bytes {response_stats['bytes']}")
+    return lines
+
+registry.add_collector(_explanation_cache_metrics)
+
+def _llm_provider_metrics() -> List[str]:
+    lines = ["# TYPE safespell_llm_circuit_open gauge"]
+    for backend_id, state in get_provider().breaker_states().items():
+        lines.append(f'safespell_llm_circuit_open{{provider="{backend_id}"}} {int(state != "closed")}')
+    return lines
+
+registry.add_collector(_llm_provider_metrics)
+
+def _llm_scheduler_metrics() -> List[str]:
+    stats = llm_scheduler.stats()
+    lines = [
+        "# TYPE safespell_llm_outstanding gauge",
+        f"safespell_llm_outstanding {stats['outstanding']}",
+        "# TYPE safespell_llm_queue_depth gauge"
+    ]
+    for lane in LANES:
+        lines.append(f'safespell_llm_queue_depth{{lane="{lane}"}} {stats["lanes"][lane]["depth"]}')
+    return lines
+
+registry.add_collector(_llm_scheduler_metrics)
+
+def _match_pool_metrics() -> List[str]:
+    return [
+        "# TYPE safespell_match_pool_pending gauge",
+        f"safespell_match_pool_pending {match_pool.pending}"
+    ]
+
+registry.add_collector(_match_pool_metrics)
+
+def _startup_metrics() -> List[str]:
+    return [
+        "# TYPE safespell_ready gauge",
+        f"safespell_ready {int(readiness.ready)}",
+        "# TYPE safespell_startup_seconds gauge",
+        f'safespell_startup_seconds{{phase="import"}} {readiness.import_seconds}',
+        f'safespell_startup_seconds{{phase="warmup"}} {readiness.warmup_seconds}'
+    ]
+
+registry.add_collector(_startup_metrics)
+
+@app.exception_handler(MatchPoolFullError)
+async def match_pool_full_handler(request: Request, exc: MatchPoolFullError):
+    """
+    Shed load quickly instead of queuing without bound
+    """
+    REJECTED_REQUESTS.inc(1, "match_pool_full")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Request and Response Models
 class TextAnalysisRequest(BaseModel):
     text: str
@@ -37,53 +214,558 @@ class FlaggedPhrase(BaseModel):
     start_index: int
     end_index: int
     explanation: str
+    severity: Optional[int] = None
+    # Classifier probability for sentences flagged by the prescreen stage
+    # (None for exact lexicon matches)
+    score: Optional[float] = None
 
 class TextAnalysisResponse(BaseModel):
     flagged_phrases: List[FlaggedPhrase]
     severity_score: int
     original_text: str
 
+class PhraseSpan(BaseModel):
+    phrase: str
+    start_index: int
+    end_index: int
+    # Base severity from the lexicon, when it gives one for the phrase
+    severity: Optional[int] = None
+
+class FileAnalysisResponse(BaseModel):
+    spans: List[PhraseSpan]
+    severity_score: int
+    total_characters: int
+    # Keyed by normalized phrase; only filled in with ?explain=true
+    explanations: Optional[Dict[str, str]] = None
+
+class TextEdit(BaseModel):
+    offset: int
+    delete_count: int = 0
+    insert_text: str = ""
+
+class SessionEditRequest(BaseModel):
+    edits: List[TextEdit]
+
+class SessionAnalysisResponse(BaseModel):
+    session_id: str
+    spans: List[PhraseSpan]
+    severity_score: int
+    # Only phrases the session has not been sent an explanation for yet,
+    # keyed by normalized phrase
+    new_explanations: Dict[str, str]
+
+class BatchAnalysisRequest(BaseModel):
+    texts: List[str]
+
+class BatchAnalysisItem(BaseModel):
+    index: int
+    result: Optional[TextAnalysisResponse] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchAnalysisItem]
+    unique_phrases: int
+
+def _build_analysis_response(text: str, abusive_phrases: List[Dict[str, Any]], explanations: List[str], severities: Optional[List[Optional[int]]] = None) -> TextAnalysisResponse:
+    """
+    Assemble the /analyze response from the matches and their explanations
+    """
+    if severities is None:
+        severities = [None] * len(abusive_phrases)
+    flagged_phrases = [
+        FlaggedPhrase(
+            phrase=phrase_info["phrase"],
+            start_index=phrase_info["start_index"],
+            end_index=phrase_info["end_index"],
+            explanation=explanation,
+            # The LLM's severity (document mode), else the lexicon's base severity
+            severity=severity if severity is not None else phrase_info.get("severity"),
+            score=phrase_info.get("score")
+        )
+        for phrase_info, explanation, severity in zip(abusive_phrases, explanations, severities)
+    ]
+    return TextAnalysisResponse(
+        flagged_phrases=flagged_phrases,
+        severity_score=calculate_severity_score(abusive_phrases),
+        original_text=text
+    )
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to SAFESPELL API"}
 
+@app.get("/health")
+async def health():
+    """
+    Liveness: the worker is up (it may still be warming up, see /ready)
+    """
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 200 once warm-up has finished, 503 until then. Also reports
+    start-up import time, warm-up time and the result of each warm-up step.
+    """
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.to_dict())
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: request and per-stage latency, flagged phrases per
+    text, LLM calls and the token counts/durations reported by Ollama
+    """
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def _find_phrases(text: str) -> List[Dict[str, Any]]:
+    """
+    get_abusive_phrases, timed as the "match" stage. Large texts are matched
+    (and prescreened) in the worker pool so they don't block the event loop,
+    and count against its queue limit. With the prescreen classifier
+    enabled, sentences it flags (outside the exact matches) are added,
+    carrying their "score".
+    """
+    with stage_timer("match"):
+        abusive_phrases = await match_pool.find(text)
+    model = get_prescreen_model()
+    if model is not None:
+        with stage_timer("prescreen"):
+            if len(text) > match_pool.inline_max_chars:
+                screened = await match_pool.run(model.screen, text, abusive_phrases)
+            else:
+                screened = model.screen(text, abusive_phrases)
+        if screened:
+            abusive_phrases = sorted(abusive_phrases + screened, key=lambda item: item["start_index"])
+    FLAGGED_PHRASES.observe(len(abusive_phrases))
+    return abusive_phrases
+
+def _check_text(text: str) -> None:
+    """
+    Reject empty or oversized input before doing any work
+    """
+    if not text or len(text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    if len(text) > MAX_TEXT_LENGTH:
+        REJECTED_REQUESTS.inc(1, "too_large")
+        raise HTTPException(status_code=413, detail=f"Text too long: at most {MAX_TEXT_LENGTH} characters (use /analyze/file for larger inputs)")
+
+@app.get("/lexicon")
+async def lexicon_info():
+    """
+    Version, source and size of the active lexicon
+    """
+    return get_lexicon().summary()
+
+@app.post("/lexicon/reload")
+async def lexicon_reload(request: Request):
+    """
+    Re-read LEXICON_PATH and atomically swap in the new matcher. Requests
+    already running finish with the lexicon they started with. Compiling
+    takes seconds for large lexicons (about 2s at 50k phrases; loading a
+    snapshot about 0.4s), so the endpoint needs ADMIN_TOKEN and is disabled
+    without one.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Lexicon reload is disabled: ADMIN_TOKEN is not set")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        lexicon = await asyncio.to_thread(reload_lexicon)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lexicon reload failed, keeping the current lexicon: {e}")
+    return lexicon.summary()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters of the explanation cache (and of the response cache)
+    """
+    return {**explanation_cache.stats(), "response_cache": response_cache.stats()}
+
+@app.get("/llm/scheduler")
+async def llm_scheduler_stats():
+    """
+    Outstanding LLM calls and queue depth per scheduler lane (wait times are
+    in /metrics as safespell_llm_queue_wait_seconds)
+    """
+    return llm_scheduler.stats()
+
+async def _explain_document(text: str, abusive_phrases: List[Dict[str, Any]]) -> Tuple[List[str], List[Optional[int]]]:
+    """
+    Explain all flagged phrases of a document with one structured LLM call,
+    falling back to per-phrase calls for entries that come back malformed.
+    Returns explanations and severities aligned with abusive_phrases.
+    """
+    # Send each distinct phrase once, with the context of its first occurrence
+    unique: Dict[str, Dict[str, Any]] = {}
+    for phrase_info in abusive_phrases:
+        unique.setdefault(normalize_phrase(phrase_info["phrase"]), phrase_info)
+    keys = list(unique)
+
+    try:
+        parsed = await get_document_explanations(text, [unique[key] for key in keys])
+    except Exception as e:
+        print(f"Document explanation failed, falling back to per-phrase calls: {e}")
+        parsed = [None] * len(keys)
+
+    missing = [index for index, result in enumerate(parsed) if result is None]
+    if missing:
+        retried = await gather_bounded(
+            [unique[keys[index]]["phrase"] for index in missing],
+            get_gpt_explanation,
+            fallback=lambda phrase, e: FALLBACK_EXPLANATION
+        )
+        for index, explanation in zip(missing, retried):
+            parsed[index] = {"explanation": explanation, "severity": None}
+
+    by_key = dict(zip(keys, parsed))
+    results = [by_key[normalize_phrase(phrase_info["phrase"])] for phrase_info in abusive_phrases]
+    return [result["explanation"] for result in results], [result["severity"] for result in results]
+
+def _response_versions() -> tuple:
+    """
+    Versions of the lexicon, model, prompt and prescreen an /analyze
+    response depends on; cached responses are dropped when they change
+    """
+    model = get_prescreen_model()
+    prescreen = f"{model.version}@{model.threshold}" if model is not None else ""
+    return (get_lexicon().version, get_provider().model_id, PROMPT_VERSION, prescreen)
+
 @app.post("/analyze", response_model=TextAnalysisResponse)
-async def analyze_text_endpoint(request: TextAnalysisRequest):
+async def analyze_text_endpoint(request: TextAnalysisRequest, http_request: Request, mode: Optional[str] = None, format: Optional[str] = None):
+    """
+    Analyze text and explain each flagged phrase. `mode=document` explains
+    all phrases with one structured LLM call (with per-phrase severities);
+    `mode=per_phrase` makes one call per phrase. Defaults to EXPLANATION_MODE.
+
+    The (weak) ETag identifies the text together with the lexicon and model
+    versions: `If-None-Match` with it gets a 304 without any analysis, and
+    repeated texts are served from the response cache (RESPONSE_CACHE_BYTES).
+    Responses with fallback explanations (see is_fallback) get no ETag and
+    `Cache-Control: no-store`.
+
+    `format=compact` (or `Accept: application/vnd.safespell.compact+json`)
+    returns the compact format of app/utils/response_format.py, and
+    `format=msgpack` (or `Accept: application/msgpack`) the same as MessagePack.
+    """
+    mode = mode or EXPLANATION_MODE
+    if mode not in ("per_phrase", "document"):
+        raise HTTPException(status_code=400, detail="mode must be 'per_phrase' or 'document'")
+    try:
+        response_format = negotiate_format(http_request.headers.get("accept"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
     try:
         # Get the text from the request
         text = request.text
-        
-        if not text or len(text.strip()) == 0:
-            raise HTTPException(status_code=400, detail="Text cannot be empty")
+        _check_text(text)
+
+        versions = _response_versions()
+        response_cache.check_versions(versions)
+        # Mode and format only pick the entry; switching them must not empty the cache
+        key = response_cache_key(text, (mode, response_format) + versions)
+        headers = {"ETag": etag_for(key), "Vary": "Accept"}
+        if etag_matches(http_request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if response_cache.enabled:
+            cached = response_cache.get(key)
+            if cached is not None:
+                content, media_type = cached
+                return Response(content, media_type=media_type, headers={**headers, "X-Cache": "hit"})
+            headers["X-Cache"] = "miss"
         
         # Find abusive phrases in the text
-        abusive_phrases = get_abusive_phrases(text)
+        abusive_phrases = await _find_phrases(text)
         
-        # Calculate severity score (1-5)
-        severity_score = min(5, max(1, len(abusive_phrases) + 1)) if abusive_phrases else 1
-        
-        # Get GPT explanations for each phrase
-        flagged_phrases = []
-        for phrase_info in abusive_phrases:
-            explanation = await get_gpt_explanation(phrase_info["phrase"])
-            flagged_phrases.append(
-                FlaggedPhrase(
-                    phrase=phrase_info["phrase"],
-                    start_index=phrase_info["start_index"],
-                    end_index=phrase_info["end_index"],
-                    explanation=explanation
-                )
+        if mode == "document" and abusive_phrases:
+            # One structured call for the whole document
+            explanations, severities = await _explain_document(text, abusive_phrases)
+        else:
+            # Get GPT explanations for all phrases concurrently, in original order
+            explanations = await gather_bounded(
+                [phrase_info["phrase"] for phrase_info in abusive_phrases],
+                get_gpt_explanation,
+                fallback=lambda phrase, e: FALLBACK_EXPLANATION
             )
+            severities = None
         
-        return TextAnalysisResponse(
-            flagged_phrases=flagged_phrases,
-            severity_score=severity_score,
-            original_text=text
-        )
+        # Build and serialize the response, including the severity score (1-5)
+        with stage_timer("serialize"):
+            if response_format == "json":
+                response = _build_analysis_response(text, abusive_phrases, explanations, severities)
+                content, media_type = response.model_dump_json().encode("utf-8"), "application/json"
+            else:
+                content, media_type = encode_compact(
+                    build_compact_response(abusive_phrases, explanations, severities, calculate_severity_score(abusive_phrases)),
+                    response_format
+                )
+        # Responses with fallback explanations are neither cached here nor
+        # given an ETag (a client revalidating it would keep the fallbacks),
+        # so the next request gets another chance at real ones
+        if any(is_fallback(explanation) for explanation in explanations):
+            del headers["ETag"]
+            headers["Cache-Control"] = "no-store"
+        else:
+            response_cache.put(key, (content, media_type))
+        return Response(content, media_type=media_type, headers=headers)
     
+    except (HTTPException, MatchPoolFullError):
+        # Client errors and load shedding keep their own status codes
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch_endpoint(request: BatchAnalysisRequest):
+    """
+    Analyze many texts at once. Each distinct flagged phrase (after
+    normalization) is explained only once for the whole batch, and the
+    explanation is attached to every occurrence. A document that fails gets
+    an error entry without affecting the others.
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="Texts cannot be empty")
+    if len(request.texts) > BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {BATCH_MAX_TEXTS} texts per request")
+
+    # 1. Match every document and collect the unique phrases across the batch
+    matches: Dict[int, List[Dict[str, Any]]] = {}
+    results: List[BatchAnalysisItem] = []
+    unique_phrases: Dict[str, str] = {}
+    for index, text in enumerate(request.texts):
+        try:
+            if not text or len(text.strip()) == 0:
+                raise ValueError("Text cannot be empty")
+            if len(text) > BATCH_MAX_TEXT_LENGTH:
+                raise ValueError(f"Text too long: at most {BATCH_MAX_TEXT_LENGTH} characters")
+            matches[index] = await _find_phrases(text)
+            for phrase_info in matches[index]:
+                unique_phrases.setdefault(normalize_phrase(phrase_info["phrase"]), phrase_info["phrase"])
+            results.append(BatchAnalysisItem(index=index))
+        except MatchPoolFullError:
+            raise
+        except Exception as e:
+            results.append(BatchAnalysisItem(index=index, error=str(e)))
+
+    # 2. Explain each unique phrase once
+    keys = list(unique_phrases)
+    explanations = await gather_bounded(
+        [unique_phrases[key] for key in keys],
+        get_gpt_explanation,
+        fallback=lambda phrase, e: FALLBACK_EXPLANATION
+    )
+    explanation_by_key = dict(zip(keys, explanations))
+
+    # 3. Attach the explanations to every occurrence
+    for index, abusive_phrases in matches.items():
+        try:
+            results[index].result = _build_analysis_response(
+                request.texts[index],
+                abusive_phrases,
+                [explanation_by_key[normalize_phrase(phrase_info["phrase"])] for phrase_info in abusive_phrases]
+            )
+        except Exception as e:
+            results[index].error = str(e)
+
+    return BatchAnalysisResponse(results=results, unique_phrases=len(keys))
+
+@app.post("/analyze/file", response_model=FileAnalysisResponse)
+async def analyze_file_endpoint(file: UploadFile = File(...), explain: bool = False):
+    """
+    Analyze an uploaded UTF-8 text file of up to MAX_UPLOAD_BYTES. The file
+    is decoded and scanned chunk by chunk, so memory use stays flat, and the
+    response is a compact span list without the original text. Large chunks
+    are scanned in the match pool, under its admission control. With
+    ?explain=true each distinct phrase is explained once.
+    """
+    lexicon = get_lexicon()
+    scanner = lexicon.matcher.scanner(lexicon.severities)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    spans: List[Dict[str, Any]] = []
+    received = 0
+
+    async def scan(chunk: str) -> None:
+        if len(chunk) > match_pool.inline_max_chars:
+            spans.extend(await match_pool.run(scanner.feed, chunk))
+        else:
+            spans.extend(scanner.feed(chunk))
+
+    while True:
+        data = await file.read(UPLOAD_CHUNK_SIZE)
+        if not data:
+            break
+        received += len(data)
+        if received > MAX_UPLOAD_BYTES:
+            REJECTED_REQUESTS.inc(1, "too_large")
+            raise HTTPException(status_code=413, detail=f"File too large: at most {MAX_UPLOAD_BYTES} bytes")
+        await scan(decoder.decode(data))
+    await scan(decoder.decode(b"", final=True))
+    spans.extend(scanner.close())
+    spans.sort(key=lambda span: (span["start_index"], span["end_index"]))
+
+    explanations = None
+    if explain and spans:
+        unique_phrases: Dict[str, str] = {}
+        for span in spans:
+            unique_phrases.setdefault(normalize_phrase(span["phrase"]), span["phrase"])
+        keys = list(unique_phrases)
+        explained = await gather_bounded(
+            [unique_phrases[key] for key in keys],
+            get_gpt_explanation,
+            fallback=lambda phrase, e: FALLBACK_EXPLANATION
+        )
+        explanations = dict(zip(keys, explained))
+
+    return FileAnalysisResponse(
+        spans=[PhraseSpan(**span) for span in spans],
+        severity_score=calculate_severity_score(spans),
+        total_characters=scanner.total_characters,
+        explanations=explanations
+    )
+
+async def _session_response(session) -> SessionAnalysisResponse:
+    """
+    Build a session response, explaining only phrases that are new to it
+    """
+    spans = session.matches()
+    new_phrases: Dict[str, str] = {}
+    for span in spans:
+        key = normalize_phrase(span["phrase"])
+        if key not in session.explained:
+            new_phrases.setdefault(key, span["phrase"])
+    keys = list(new_phrases)
+    explanations = await gather_bounded(
+        [new_phrases[key] for key in keys],
+        get_gpt_explanation,
+        fallback=lambda phrase, e: FALLBACK_EXPLANATION
+    )
+    # Fallbacks are retried on the next edit, when the LLM may be back
+    session.explained.update(
+        key for key, explanation in zip(keys, explanations)
+        if not is_fallback(explanation)
+    )
+
+    return SessionAnalysisResponse(
+        session_id=session.session_id,
+        spans=[PhraseSpan(**span) for span in spans],
+        severity_score=calculate_severity_score(spans),
+        new_explanations=dict(zip(keys, explanations))
+    )
+
+@app.post("/sessions", response_model=SessionAnalysisResponse)
+async def create_session_endpoint(request: TextAnalysisRequest):
+    """
+    Start an as-you-type editing session with the initial text
+    """
+    try:
+        lexicon = get_lexicon()
+        session = session_store.create(request.text, lexicon.matcher, lexicon.severities)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return await _session_response(session)
+
+@app.post("/sessions/{session_id}/edits", response_model=SessionAnalysisResponse)
+async def edit_session_endpoint(session_id: str, request: SessionEditRequest):
+    """
+    Apply edits (offset, delete_count, insert_text), in order, to the
+    session's text; if any edit is rejected, none is applied. Only the changed region is re-scanned, and only phrases
+    that newly appear are explained.
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    try:
+        with stage_timer("match"):
+            # All or nothing: a rejected edit leaves the session as it was
+            session.apply_edits((edit.offset, edit.delete_count, edit.insert_text) for edit in request.edits)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _session_response(session)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session_endpoint(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": session_id}
+
+def _format_stream_event(event: Dict[str, Any], sse: bool) -> str:
+    """
+    Encode one stream event as an NDJSON line or a Server-Sent Event
+    """
+    data = json.dumps(event)
+    return f"data: {data}\n\n" if sse else data + "\n"
+
+async def _stream_analysis(abusive_phrases: List[Dict[str, Any]], tokens: bool, sse: bool) -> AsyncIterator[str]:
+    """
+    Emit the flagged spans and severity first, then one explanation event per
+    phrase in completion order (optionally preceded by its token events)
+    """
+    yield _format_stream_event({
+        "type": "spans",
+        "flagged_phrases": abusive_phrases,
+        "severity_score": calculate_severity_score(abusive_phrases)
+    }, sse)
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def explain(item: Dict[str, Any]) -> str:
+        if not tokens:
+            return await get_gpt_explanation(item["phrase"])
+        parts = []
+        async for token in stream_gpt_explanation(item["phrase"]):
+            parts.append(token)
+            queue.put_nowait({"type": "token", "index": item["index"], "text": token})
+        return "".join(parts).strip()
+
+    async def produce() -> None:
+        items = [{"index": index, "phrase": info["phrase"]} for index, info in enumerate(abusive_phrases)]
+        async for index, explanation in as_completed_bounded(
+            items,
+            explain,
+            fallback=lambda item, e: FALLBACK_EXPLANATION
+        ):
+            queue.put_nowait({
+                "type": "explanation",
+                "index": index,
+                "phrase": abusive_phrases[index]["phrase"],
+                "explanation": explanation
+            })
+        queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield _format_stream_event(event, sse)
+        await producer
+    finally:
+        # The client may disconnect mid-stream; stop any outstanding LLM calls
+        producer.cancel()
+
+    yield _format_stream_event({"type": "done"}, sse)
+
+@app.post("/analyze/stream")
+async def analyze_text_stream_endpoint(request: TextAnalysisRequest, http_request: Request, tokens: bool = False):
+    """
+    Streaming variant of /analyze. Responds with NDJSON, or with Server-Sent
+    Events when the client sends `Accept: text/event-stream`. Pass
+    `?tokens=true` to also receive explanation tokens as Ollama generates them.
+    """
+    _check_text(request.text)
+    # Matched before the response starts, so an overloaded pool still gets a proper 503
+    abusive_phrases = await _find_phrases(request.text)
+
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    return StreamingResponse(
+        _stream_analysis(abusive_phrases, tokens, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
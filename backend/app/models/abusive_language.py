@@ -1,7 +1,9 @@
-from typing import List, Dict, Any
-import re
+from typing import List, Dict, Any, Iterable, Iterator
 
-# List of potentially abusive, manipulative, or gaslighting phrases
+from app.models.lexicon import get_lexicon, phrase_info
+
+# Built-in list of potentially abusive, manipulative, or gaslighting phrases.
+# Used when no LEXICON_PATH is configured (see app/models/lexicon.py).
 ABUSIVE_PHRASES = [
     "you're overreacting",
     "you're too sensitive",
@@ -61,7 +63,7 @@ def analyze_text(text: str) -> Dict[str, Any]:
     Analyze text for abusive language and return analysis results
     """
     abusive_phrases = get_abusive_phrases(text)
-    severity_score = min(5, max(1, len(abusive_phrases) + 1)) if abusive_phrases else 1
+    severity_score = calculate_severity_score(abusive_phrases)
     
     return {
         "flagged_phrases": abusive_phrases,
@@ -69,23 +71,39 @@ def analyze_text(text: str) -> Dict[str, Any]:
         "original_text": text
     }
 
+def calculate_severity_score(abusive_phrases: List[Dict[str, Any]]) -> int:
+    """
+    Severity score (1-5) grows with the number of flagged phrases, and is at
+    least the highest base severity the lexicon gives any of them
+    """
+    if not abusive_phrases:
+        return 1
+    score = min(5, len(abusive_phrases) + 1)
+    return max([score] + [phrase_info["severity"] for phrase_info in abusive_phrases if phrase_info.get("severity")])
+
 def get_abusive_phrases(text: str) -> List[Dict[str, Any]]:
     """
-    Find abusive phrases in the text and return their positions
+    Find abusive phrases in the text and return their positions, sorted by
+    where they start in the text
     """
-    text_lower = text.lower()
     results = []
     
-    for phrase in ABUSIVE_PHRASES:
-        for match in re.finditer(r'\b' + re.escape(phrase) + r'\b', text_lower):
-            start_index = match.start()
-            end_index = match.end()
-            original_phrase = text[start_index:end_index]
-            
-            results.append({
-                "phrase": original_phrase,
-                "start_index": start_index,
-                "end_index": end_index
-            })
+    # The compiled matcher of the active lexicon, built once and shared
+    lexicon = get_lexicon()
+    for start_index, end_index, index in lexicon.matcher.find_all(text):
+        results.append(phrase_info(text, start_index, end_index, lexicon.severities[index]))
     
-    return results
\ No newline at end of file
+    return results
+
+
+def iter_abusive_phrases(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Find abusive phrases in a text given as consecutive chunks (e.g. read from
+    a file), using memory independent of the text length. Offsets refer to
+    the whole text; phrases split across chunks are found exactly once.
+    """
+    lexicon = get_lexicon()
+    scanner = lexicon.matcher.scanner(lexicon.severities)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
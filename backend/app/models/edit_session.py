@@ -0,0 +1,177 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Set, Tuple
+from dotenv import load_dotenv
+
+from app.models.lexicon import phrase_info
+from app.models.phrase_matcher import PhraseMatcher
+
+# Load environment variables
+load_dotenv()
+
+# Sessions untouched for this many seconds are dropped
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", 15 * 60))
+# Largest text a single session may hold, in characters
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", 200_000))
+# Most sessions kept per worker; the least recently used one is dropped first
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", 1000))
+
+
+class SessionLimitError(ValueError):
+    """
+    Raised when an edit would grow a session past SESSION_MAX_CHARS
+    """
+
+
+class EditSession:
+    """
+    Text being edited by one client, with its current matches. Edits only
+    re-scan the changed region plus a margin of the longest phrase; matches
+    elsewhere are kept and shifted.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        text: str,
+        matcher: PhraseMatcher,
+        severities: Optional[Sequence[Optional[int]]] = None,
+        max_chars: int = SESSION_MAX_CHARS,
+    ):
+        if len(text) > max_chars:
+            raise SessionLimitError(f"Text too long: sessions hold at most {max_chars} characters")
+        self.session_id = session_id
+        self.matcher = matcher
+        # Base severity of each phrase, indexed like matcher.phrases
+        self.severities = severities
+        self.max_chars = max_chars
+        self.text = text
+        self.spans: List[Tuple[int, int, int]] = matcher.find_all(text)
+        # Normalized phrases the client already has explanations for
+        self.explained: Set[str] = set()
+        self.last_used = time.monotonic()
+
+    def apply_edit(self, offset: int, delete_count: int, insert_text: str) -> None:
+        """
+        Replace text[offset:offset + delete_count] with insert_text and update
+        the matches incrementally
+        """
+        self.apply_edits([(offset, delete_count, insert_text)])
+
+    def apply_edits(self, edits: Iterable[Tuple[int, int, str]]) -> None:
+        """
+        Apply (offset, delete_count, insert_text) edits in order, all or
+        nothing: if one is invalid the session is left unchanged
+        """
+        text, spans = self.text, self.spans
+        for offset, delete_count, insert_text in edits:
+            text, spans = self._edited(text, spans, offset, delete_count, insert_text)
+        self.text, self.spans = text, spans
+
+    def _edited(
+        self, old_text: str, old_spans: List[Tuple[int, int, int]], offset: int, delete_count: int, insert_text: str
+    ) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """
+        Text and matches after one edit, computed without changing the session
+        """
+        if not (0 <= offset <= len(old_text)) or not (0 <= delete_count <= len(old_text) - offset):
+            raise ValueError(f"Edit out of range: offset={offset}, delete_count={delete_count}, length={len(old_text)}")
+        new_length = len(old_text) - delete_count + len(insert_text)
+        if new_length > self.max_chars:
+            raise SessionLimitError(f"Text too long: sessions hold at most {self.max_chars} characters")
+
+        text = old_text[:offset] + insert_text + old_text[offset + delete_count:]
+        delta = len(insert_text) - delete_count
+
+        # Matches ending before the edit saw none of the changed characters
+        # (nor the character after them, used by the word-boundary check)
+        left: List[Tuple[int, int, int]] = []
+        last_end: Dict[int, int] = {}
+        right: List[Tuple[int, int, int]] = []
+        for start, end, index in old_spans:
+            if end < offset:
+                left.append((start, end, index))
+                last_end[index] = max(last_end.get(index, -1), end)
+            elif start > offset + delete_count:
+                right.append((start + delta, end + delta, index))
+
+        # Re-scan from just before the edit, continuing the same-phrase
+        # non-overlap rule from the kept matches. Matches after the edit can
+        # still pair differently (a repeated phrase shifting by one), so widen
+        # the window until the matches near its end agree with the old ones;
+        # from there on the text and the pairing are unchanged.
+        max_length = self.matcher.max_phrase_length
+        margin = max_length + 1
+        window_start = max(0, offset - margin)
+        window_end = min(len(text), offset + len(insert_text) + 2 * margin)
+        while True:
+            found = [
+                match for match in self.matcher.find_all(text, window_start, window_end, dict(last_end))
+                if match[1] >= offset
+            ]
+            if window_end == len(text):
+                break
+            sync_from = window_end - max_length
+            if [m for m in found if m[1] > sync_from] == [m for m in right if sync_from < m[1] <= window_end]:
+                break
+            window_end = min(len(text), window_end + 2 * (window_end - offset))
+
+        return text, sorted(left + found + [match for match in right if match[1] > window_end])
+
+    def matches(self) -> List[Dict[str, Any]]:
+        """
+        Current matches, in the same shape as get_abusive_phrases (with the
+        lexicon's base severity when the phrase has one)
+        """
+        return [
+            phrase_info(self.text, start, end, self.severities[index] if self.severities is not None else None)
+            for start, end, index in self.spans
+        ]
+
+
+class SessionStore:
+    """
+    In-memory sessions of one worker, with idle expiry and a count cap
+    """
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS, max_sessions: int = SESSION_MAX_COUNT):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, EditSession]" = OrderedDict()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        # Sessions are kept in least-recently-used order, so stop at the first live one
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+
+    def create(self, text: str, matcher: PhraseMatcher, severities: Optional[Sequence[Optional[int]]] = None) -> EditSession:
+        self._expire()
+        session = EditSession(uuid.uuid4().hex, text, matcher, severities)
+        self._sessions[session.session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[EditSession]:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# Process-wide session store used by the /sessions endpoints
+session_store = SessionStore()
@@ -0,0 +1,260 @@
+from typing import List, Dict, Tuple, Iterable, Optional, Sequence, Any
+
+# Text is case-folded in blocks of this many characters, so scanning never
+# needs a second full-size copy of the input
+FOLD_BLOCK_SIZE = 64 * 1024
+
+
+def _is_word_char(ch: str) -> bool:
+    """
+    Mirror the regex \\w class so boundaries behave exactly like r'\\b'
+    """
+    return ch.isalnum() or ch == "_"
+
+
+def _fold_case(text: str) -> str:
+    """
+    Lowercase text without changing its length, so offsets in the folded
+    copy still line up with the original text
+    """
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # A handful of characters (e.g. 'İ') expand when lowercased; keep only the
+    # first character of their lowercase form so indices stay aligned.
+    return "".join(ch.lower()[0] for ch in text)
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton that finds every phrase of a lexicon in a single
+    pass over the text, with the same word-boundary semantics as
+    re.finditer(r'\\b' + re.escape(phrase) + r'\\b', text.lower()).
+
+    The automaton is stored as plain lists and dicts so it can be pickled.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        # Deduplicate while keeping the lexicon order stable
+        self.phrases: List[str] = list(dict.fromkeys(p.lower() for p in phrases if p))
+        self._lengths: List[int] = [len(p) for p in self.phrases]
+        self.max_phrase_length = max(self._lengths, default=0)
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        # 1. Build the trie
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for ch in phrase:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = self._out[state] + (index,)
+
+        # 2. Breadth-first pass to wire up failure links and merge outputs
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def to_state(self) -> Tuple[Any, ...]:
+        """
+        Compiled automaton as plain built-in types (suitable for marshal)
+        """
+        return (self.phrases, self._goto, self._fail, self._out)
+
+    @classmethod
+    def from_state(cls, state: Tuple[Any, ...]) -> "PhraseMatcher":
+        """
+        Rebuild a matcher from to_state() output without recompiling it
+        """
+        matcher = cls.__new__(cls)
+        phrases, goto, fail, out = state
+        matcher.phrases = list(phrases)
+        matcher._lengths = [len(p) for p in matcher.phrases]
+        matcher.max_phrase_length = max(matcher._lengths, default=0)
+        matcher._goto = goto
+        matcher._fail = fail
+        matcher._out = out
+        return matcher
+
+    def find_all(
+        self,
+        text: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        last_end: Optional[Dict[int, int]] = None,
+    ) -> List[Tuple[int, int, int]]:
+        """
+        Find every phrase in text[start:end] and return (start, end, phrase_index)
+        tuples sorted by position. Characters just outside the window are still
+        used for the word-boundary check.
+
+        Matches of different phrases may overlap; repeated matches of the same
+        phrase never overlap each other (the leftmost one wins), as with
+        re.finditer. last_end maps a phrase index to the end of its last match
+        before the window, so a rescan pairs repeats like a scan of the whole
+        text; it is updated in place.
+        """
+        if end is None:
+            end = len(text)
+        if not self.phrases or start >= end:
+            return []
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        lengths = self._lengths
+        if last_end is None:
+            last_end = {}
+        matches: List[Tuple[int, int, int]] = []
+
+        state = 0
+        for block_start in range(start, end, FOLD_BLOCK_SIZE):
+            folded = _fold_case(text[block_start:min(end, block_start + FOLD_BLOCK_SIZE)])
+            for offset, ch in enumerate(folded):
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                if not out[state]:
+                    continue
+
+                match_end = block_start + offset + 1
+                for index in out[state]:
+                    match_start = match_end - lengths[index]
+                    if not self._at_boundary(text, match_start) or not self._at_boundary(text, match_end):
+                        continue
+                    if last_end.get(index, -1) > match_start:
+                        continue
+                    last_end[index] = match_end
+                    matches.append((match_start, match_end, index))
+
+        matches.sort()
+        return matches
+
+    def scanner(self, severities: Optional[Sequence[Optional[int]]] = None) -> "ChunkScanner":
+        """
+        Start an incremental scan over text that arrives in chunks. With
+        severities (indexed like self.phrases), matches of phrases that have
+        one carry it as "severity".
+        """
+        return ChunkScanner(self, severities)
+
+    @staticmethod
+    def _at_boundary(text: str, index: int) -> bool:
+        """
+        Equivalent of r'\\b' at position index of text
+        """
+        before = index > 0 and _is_word_char(text[index - 1])
+        after = index < len(text) and _is_word_char(text[index])
+        return before != after
+
+
+class ChunkScanner:
+    """
+    Scan a text that arrives in chunks while holding only a small tail of it
+    in memory. The automaton state and the same-phrase overlap rule carry
+    over from one chunk to the next, so the matches (with offsets into the
+    whole text) are exactly those of find_all on the whole text.
+    """
+
+    def __init__(self, matcher: PhraseMatcher, severities: Optional[Sequence[Optional[int]]] = None):
+        self.matcher = matcher
+        self.severities = severities
+        # Enough text to check the boundary before any match ending in a new chunk
+        self.overlap = matcher.max_phrase_length + 1
+        self._tail = ""
+        # Global offset of the first character of self._tail
+        self._tail_start = 0
+        self._state = 0
+        self._last_end: Dict[int, int] = {}
+        # (start, end, index) of matches ending at the last character seen;
+        # their word-boundary check needs the next character
+        self._pending: List[Tuple[int, int, int]] = []
+        self.total_characters = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add the next chunk and return the matches that are now final
+        """
+        if not chunk:
+            return []
+        self.total_characters += len(chunk)
+        window = self._tail + chunk
+        results: List[Dict[str, Any]] = []
+        self._resolve(window, self._pending, results)
+        self._pending = []
+
+        goto = self.matcher._goto
+        fail = self.matcher._fail
+        out = self.matcher._out
+        lengths = self.matcher._lengths
+        state = self._state
+        window_end = self._tail_start + len(window)
+        first = len(self._tail)
+        for block_start in range(first, len(window), FOLD_BLOCK_SIZE):
+            folded = _fold_case(window[block_start:block_start + FOLD_BLOCK_SIZE])
+            for offset, ch in enumerate(folded):
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                if not out[state]:
+                    continue
+                match_end = self._tail_start + block_start + offset + 1
+                candidates = [(match_end - lengths[index], match_end, index) for index in out[state]]
+                if match_end == window_end:
+                    self._pending = candidates
+                else:
+                    self._resolve(window, candidates, results)
+        self._state = state
+
+        keep = min(len(window), self.overlap)
+        self._tail_start += len(window) - keep
+        self._tail = window[len(window) - keep:]
+        return results
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Signal the end of the text and return the remaining matches
+        """
+        results: List[Dict[str, Any]] = []
+        self._resolve(self._tail, self._pending, results)
+        self._pending = []
+        return results
+
+    def _resolve(self, window: str, candidates: List[Tuple[int, int, int]], results: List[Dict[str, Any]]) -> None:
+        """
+        Apply the word-boundary check and the same-phrase rule (in the order
+        find_all does) to candidates given in global offsets
+        """
+        for match_start, match_end, index in candidates:
+            start = match_start - self._tail_start
+            end = match_end - self._tail_start
+            if not PhraseMatcher._at_boundary(window, start) or not PhraseMatcher._at_boundary(window, end):
+                continue
+            if self._last_end.get(index, -1) > match_start:
+                continue
+            self._last_end[index] = match_end
+            result = {"phrase": window[start:end], "start_index": match_start, "end_index": match_end}
+            if self.severities is not None and self.severities[index] is not None:
+                result["severity"] = self.severities[index]
+            results.append(result)
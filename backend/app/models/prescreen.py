@@ -0,0 +1,198 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Optional classifier that flags sentences resembling abusive phrases
+# (paraphrases the exact lexicon match misses). Needs NumPy.
+PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "false").lower() in ("1", "true", "yes")
+PRESCREEN_MODEL_PATH = os.getenv(
+    "PRESCREEN_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prescreen.npz")
+)
+# Sentences scoring at least this probability go on to the explanation step
+# (empty = the threshold stored with the model)
+PRESCREEN_THRESHOLD = os.getenv("PRESCREEN_THRESHOLD", "")
+
+# Character n-gram sizes and hashing constants shared by training and scoring
+NGRAM_SIZES = (3, 4, 5)
+_HASH_MULTIPLIER = 1_000_003
+_MIX_MULTIPLIER = 0x9E3779B1
+_MASK32 = 0xFFFFFFFF
+
+_SENTENCE = re.compile(r"[^.!?\n]+")
+_TOKEN = re.compile(r"[\w']+")
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) offsets of the sentences of text, trimmed of surrounding
+    whitespace; sentences without any word are skipped
+    """
+    spans = []
+    for match in _SENTENCE.finditer(text):
+        start, end = match.span()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end and _TOKEN.search(text, start, end):
+            spans.append((start, end))
+    return spans
+
+
+def normalize_sentence(sentence: str) -> str:
+    """
+    Lowercased words separated by single spaces, padded with a space on
+    both sides so n-grams see word boundaries
+    """
+    return " " + " ".join(_TOKEN.findall(sentence.lower())) + " "
+
+
+def hash_features(np: Any, sentences: Sequence[str], bits: int) -> Tuple[Any, Any]:
+    """
+    Hashed character n-grams of all sentences at once. Returns two arrays of
+    equal length: the sentence index and the feature bucket (0 to 2**bits - 1)
+    of every n-gram.
+
+    All sentences are joined into one code point array (separated by 0) and
+    every n-gram of every size is hashed with vector operations over that
+    array; n-grams that span a separator are dropped.
+    """
+    joined = "\0".join(normalize_sentence(sentence) for sentence in sentences)
+    codes = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32).astype(np.uint64)
+    owner = np.cumsum(codes == 0)
+    separators = np.concatenate(([0], owner))
+
+    rows, buckets = [], []
+    for size in NGRAM_SIZES:
+        count = len(codes) - size + 1
+        if count <= 0:
+            continue
+        hashed = np.full(count, size, dtype=np.uint64)
+        for offset in range(size):
+            hashed = (hashed * _HASH_MULTIPLIER + codes[offset:offset + count]) & _MASK32
+        # No separator inside the window
+        valid = separators[size:size + count] == separators[:count]
+        mixed = ((hashed * _MIX_MULTIPLIER) & _MASK32) >> (32 - bits)
+        rows.append(owner[:count][valid])
+        buckets.append(mixed[valid])
+
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(rows).astype(np.int64), np.concatenate(buckets).astype(np.int64)
+
+
+class PrescreenModel:
+    """
+    Logistic regression over hashed character n-grams. Features of a
+    sentence are L2-normalized counts, so its score is
+    bias + sum(weights[buckets]) / sqrt(number of n-grams).
+    """
+
+    def __init__(self, np: Any, weights: Any, bias: float, threshold: float, version: str = ""):
+        self.np = np
+        self.weights = weights
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+        self.version = version
+        self.bits = int(weights.shape[0]).bit_length() - 1
+
+    @classmethod
+    def load(cls, path: str) -> "PrescreenModel":
+        import numpy as np
+
+        with np.load(path) as data:
+            return cls(
+                np,
+                data["weights"].astype(np.float32),
+                float(data["bias"]),
+                float(data["threshold"]),
+                str(data["version"]) if "version" in data else ""
+            )
+
+    def save(self, path: str) -> None:
+        self.np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            threshold=self.threshold,
+            version=self.version
+        )
+
+    def score(self, sentences: Sequence[str]) -> Any:
+        """
+        Probability for every sentence, computed in one batch
+        """
+        np = self.np
+        if not sentences:
+            return np.zeros(0, dtype=np.float32)
+        rows, buckets = hash_features(np, sentences, self.bits)
+        totals = np.bincount(rows, weights=self.weights[buckets], minlength=len(sentences))
+        counts = np.bincount(rows, minlength=len(sentences))
+        logits = self.bias + totals / np.sqrt(np.maximum(counts, 1))
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def screen(self, text: str, exclude: Sequence[Dict[str, Any]] = (), threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Sentences of text scoring at least threshold, as phrase dicts (like
+        get_abusive_phrases, plus "score"). Sentences overlapping a span in
+        `exclude` (e.g. exact lexicon matches) are skipped.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        spans = split_sentences(text)
+        if exclude:
+            spans = _without_overlaps(spans, sorted((item["start_index"], item["end_index"]) for item in exclude))
+        if not spans:
+            return []
+
+        scores = self.score([text[start:end] for start, end in spans])
+        return [
+            {"phrase": text[start:end], "start_index": start, "end_index": end, "score": round(float(score), 4)}
+            for (start, end), score in zip(spans, scores)
+            if score >= threshold
+        ]
+
+
+def _without_overlaps(spans: List[Tuple[int, int]], ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Drop the spans that overlap any of ranges (both sorted by start)
+    """
+    kept = []
+    index = 0
+    for start, end in spans:
+        # Ranges ending before this span can't overlap it or any later one
+        while index < len(ranges) and ranges[index][1] <= start:
+            index += 1
+        if index < len(ranges) and ranges[index][0] < end:
+            continue
+        kept.append((start, end))
+    return kept
+
+
+_model: Optional[PrescreenModel] = None
+_load_failed = False
+
+
+def get_prescreen_model() -> Optional[PrescreenModel]:
+    """
+    The prescreen model if PRESCREEN_ENABLED and it can be loaded, else None.
+    A missing NumPy or model file disables the stage with a message instead
+    of failing requests.
+    """
+    global _model, _load_failed
+    if not PRESCREEN_ENABLED or _load_failed:
+        return None
+    if _model is None:
+        try:
+            _model = PrescreenModel.load(PRESCREEN_MODEL_PATH)
+        except (ImportError, OSError, KeyError, ValueError) as e:
+            _load_failed = True
+            print(f"Prescreen classifier disabled: {e}")
+            return None
+        if PRESCREEN_THRESHOLD:
+            _model.threshold = float(PRESCREEN_THRESHOLD)
+    return _model
@@ -0,0 +1,80 @@
+import os
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of LLM calls a single HTTP request may have in flight, so
+# one message with many red flags cannot take every slot for itself (the
+# process-wide limit is enforced by app.utils.llm_scheduler)
+LLM_MAX_CONCURRENCY_PER_REQUEST = int(os.getenv("LLM_MAX_CONCURRENCY_PER_REQUEST", 4))
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _bounded(
+    func: Callable[[T], Awaitable[R]],
+    fallback: Callable[[T, Exception], R],
+    limit: Optional[int],
+) -> Callable[[T], Awaitable[R]]:
+    """
+    Wrap func so each call holds a slot of a per-batch semaphore, and so an
+    error is turned into fallback(item, error). Cache hits return without
+    touching the LLM scheduler; misses wait there for a process-wide slot.
+    """
+    local = asyncio.Semaphore(max(1, limit or LLM_MAX_CONCURRENCY_PER_REQUEST))
+
+    async def run_one(item: T) -> Any:
+        async with local:
+            try:
+                return await func(item)
+            except Exception as e:
+                return fallback(item, e)
+
+    return run_one
+
+
+async def gather_bounded(
+    items: Sequence[T],
+    func: Callable[[T], Awaitable[R]],
+    fallback: Callable[[T, Exception], R],
+    limit: Optional[int] = None,
+) -> List[R]:
+    """
+    Run func over every item concurrently and return the results in the
+    original order. At most `limit` calls from this batch run at once. If one call
+    raises, only that item's result is replaced by fallback(item, error).
+    """
+    if not items:
+        return []
+
+    run_one = _bounded(func, fallback, limit)
+    return list(await asyncio.gather(*(run_one(item) for item in items)))
+
+
+async def as_completed_bounded(
+    items: Sequence[T],
+    func: Callable[[T], Awaitable[R]],
+    fallback: Callable[[T, Exception], R],
+    limit: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, R]]:
+    """
+    Same limits and error handling as gather_bounded, but yield
+    (index, result) pairs as soon as each call finishes. Calls that are still
+    running are cancelled if the consumer stops early.
+    """
+    run_one = _bounded(func, fallback, limit)
+
+    async def run_indexed(index: int, item: T) -> Tuple[int, R]:
+        return index, await run_one(item)
+
+    tasks = [asyncio.ensure_future(run_indexed(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,216 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# In-memory tier: number of entries and time-to-live in seconds
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", 4096))
+EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", 7 * 24 * 3600))
+# Optional on-disk tier shared by every worker on the host (empty = disabled)
+EXPLANATION_CACHE_DB = os.getenv("EXPLANATION_CACHE_DB", "")
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_phrase(phrase: str) -> str:
+    """
+    Normalize a phrase so case and spacing variants share one cache entry
+    """
+    return " ".join(phrase.lower().split())
+
+
+class _SQLiteStore:
+    """
+    Tiny key/value table used as the persistent tier. WAL mode lets several
+    uvicorn workers read and write the same file.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS explanations "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str, max_age: float) -> Optional[str]:
+        cutoff = time.time() - max_age
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM explanations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < cutoff:
+                # Expired: drop it rather than leave it for prune()
+                self._conn.execute("DELETE FROM explanations WHERE key = ? AND created_at < ?", (key, cutoff))
+                self._conn.commit()
+                return None
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._conn.commit()
+
+    def prune(self, max_age: float) -> int:
+        """
+        Delete every row older than max_age seconds; returns how many
+        """
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM explanations WHERE created_at < ?", (time.time() - max_age,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ExplanationCache:
+    """
+    Two-tier explanation cache: an in-memory LRU with TTL in front of an
+    optional SQLite store. Concurrent misses on the same key are coalesced so
+    only one caller runs the (expensive) factory.
+    """
+
+    def __init__(self, max_entries: int = EXPLANATION_CACHE_SIZE, ttl: float = EXPLANATION_CACHE_TTL, db_path: str = EXPLANATION_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._store = _SQLiteStore(db_path) if db_path else None
+        if self._store is not None:
+            # Expired rows are otherwise only removed when their key is looked up again
+            self._store.prune(ttl)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get_memory(self, key: CacheKey) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: CacheKey, value: str) -> None:
+        self._memory[key] = (time.monotonic() + self.ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """
+        Memory-only lookup, for callers that produce the value themselves
+        (e.g. while streaming it) and store it afterwards with put()
+        """
+        value = self._get_memory(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: CacheKey, value: str) -> None:
+        """
+        Store a value in the memory tier (the disk tier is filled by get_or_create)
+        """
+        self._set_memory(key, value)
+
+    async def get_or_create(self, key: CacheKey, factory: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the cached value for key, or run factory() once to create it.
+        Failures are not cached and are raised to every coalesced caller.
+        """
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The caller doing the work was cancelled, not us: try again
+                if inflight.cancelled():
+                    return await self.get_or_create(key, factory)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = None
+            if self._store is not None:
+                value = await asyncio.to_thread(self._store.get, "\x1f".join(key), self.ttl)
+            if value is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                value = await factory()
+                if self._store is not None:
+                    await asyncio.to_thread(self._store.set, "\x1f".join(key), value)
+            self._set_memory(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't let asyncio log an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters; hit_rate counts memory, disk and coalesced hits
+        """
+        lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "persistent": self._store is not None
+        }
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+# Process-wide cache used by the explanation helpers
+explanation_cache = ExplanationCache()
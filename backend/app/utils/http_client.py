@@ -0,0 +1,83 @@
+import os
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool and timeout settings shared by every outgoing LLM call
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 32))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point the OpenAI client at any OpenAI-compatible server (empty = api.openai.com)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+
+_http_session: Optional[Any] = None
+# One client per base URL (a hedge backend may be a second server)
+_openai_clients: Dict[str, Any] = {}
+
+
+def get_http_session() -> Any:
+    """
+    Return the process-wide aiohttp session, creating it on first use.
+    Must be called from inside the running event loop. aiohttp is imported
+    here, so deployments that never call Ollama don't pay for it at start-up.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_SIZE,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT
+        )
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _http_session
+
+
+def get_openai_client(base_url: Optional[str] = None) -> Any:
+    """
+    Return the process-wide async OpenAI client for base_url (default
+    OPENAI_BASE_URL), sharing one pooled httpx client between all its calls
+    """
+    base_url = OPENAI_BASE_URL if base_url is None else base_url
+    client = _openai_clients.get(base_url)
+    if client is None:
+        import httpx
+        import openai
+
+        client = _openai_clients[base_url] = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=base_url or None,
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE,
+                    keepalive_expiry=HTTP_KEEPALIVE_TIMEOUT
+                )
+            )
+        )
+    return client
+
+
+async def close_http_clients() -> None:
+    """
+    Close the shared clients; called when the application shuts down
+    """
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+    for client in _openai_clients.values():
+        await client.close()
+    _openai_clients.clear()
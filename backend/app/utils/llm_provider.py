@@ -0,0 +1,523 @@
+import os
+import json
+import time
+import asyncio
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+from app.utils.http_client import get_http_session, get_openai_client, OPENAI_BASE_URL
+from app.utils.metrics import record_ollama_usage, LLM_PROVIDER_CALLS
+from app.utils.response_parsing import DEFAULT_SEVERITY
+
+# Load environment variables
+load_dotenv()
+
+# Backend used for explanations: "ollama", "openai" (any OpenAI-compatible
+# server, see OPENAI_BASE_URL) or "static" (fixed fallback text, no LLM)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama")
+# Optional second backend that is raced against the first one when it has
+# not answered after LLM_HEDGE_DELAY seconds (empty = no hedging)
+LLM_HEDGE_PROVIDER = os.getenv("LLM_HEDGE_PROVIDER", "")
+# Server and model of the hedge backend (empty = the same as for that
+# provider type), e.g. a second Ollama host
+LLM_HEDGE_BASE_URL = os.getenv("LLM_HEDGE_BASE_URL", "")
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", 2.0))
+
+# Deadline of a single LLM call in seconds, and total LLM time budget of one
+# HTTP request (0 = no limit)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_REQUEST_BUDGET = float(os.getenv("LLM_REQUEST_BUDGET", 0))
+
+# Circuit breaker: after this many consecutive failures a backend is skipped
+# for LLM_BREAKER_RESET_SECONDS, then a single probe call is let through
+# (0 failures = breaker disabled)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+
+# Configure Ollama API
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", os.getenv("MODEL_NAME", "llama3.2"))
+# How long Ollama keeps the model loaded after a call: a duration such as
+# "30m", seconds as a number, or -1 for as long as Ollama runs
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", os.getenv("MODEL_NAME", "gpt-3.5-turbo"))
+
+# Returned when an explanation cannot be generated for a phrase
+FALLBACK_EXPLANATION = "This phrase may be considered harmful because it could invalidate someone's feelings or experiences. It's important to use language that respects others' perspectives and emotions."
+
+
+class ProviderError(RuntimeError):
+    """
+    An LLM backend failed, timed out or was skipped
+    """
+
+
+class CircuitOpenError(ProviderError):
+    """
+    Every configured backend is currently marked unhealthy
+    """
+
+
+class LLMProvider:
+    """
+    One LLM backend. complete() returns the whole generated text, stream()
+    yields it piece by piece; both raise ProviderError on failure.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, endpoint: str = ""):
+        self.model = model
+        # Server the backend talks to; two backends of one type may differ only here
+        self.endpoint = endpoint
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @property
+    def backend_id(self) -> str:
+        """
+        The model together with the server that runs it
+        """
+        return f"{self.model_id}@{self.endpoint}" if self.endpoint else self.model_id
+
+    async def complete(self, prompt: str, system: str, max_tokens: int = 150, json_schema: Optional[Dict[str, Any]] = None) -> str:
+        raise NotImplementedError
+
+    async def stream(self, prompt: str, system: str, max_tokens: int = 150) -> AsyncIterator[str]:
+        # Backends without streaming return the whole text as one piece
+        yield await self.complete(prompt, system, max_tokens)
+
+    async def warm_up(self) -> None:
+        """
+        Get the backend ready to answer quickly (e.g. load the model) before
+        traffic arrives; raises ProviderError on failure
+        """
+
+
+class OllamaProvider(LLMProvider):
+    """
+    Ollama's /api/generate over the shared, pooled aiohttp session
+    """
+
+    name = "ollama"
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        super().__init__(model, base_url)
+        self.base_url = base_url
+        # Ollama reads a bare number as seconds but a string only as a duration with a unit
+        try:
+            self.keep_alive: Any = int(keep_alive)
+        except ValueError:
+            self.keep_alive = keep_alive
+
+    def _request(self, prompt: str, system: str, max_tokens: int, stream: bool, json_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = {
+            "model": self.model,
+            "prompt": prompt,
+            "system": system,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7,
+                "num_predict": max_tokens
+            }
+        }
+        if json_schema is not None:
+            body["format"] = json_schema
+        return body
+
+    async def complete(self, prompt: str, system: str, max_tokens: int = 150, json_schema: Optional[Dict[str, Any]] = None) -> str:
+        if not self.base_url:
+            raise ProviderError("Ollama API not configured")
+        session = get_http_session()
+        async with session.post(
+            f"{self.base_url}/api/generate",
+            json=self._request(prompt, system, max_tokens, False, json_schema)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise ProviderError(f"Error calling Ollama API: {response.status} - {error_text}")
+            result = await response.json()
+        record_ollama_usage(result)
+        return result.get("response", "")
+
+    async def stream(self, prompt: str, system: str, max_tokens: int = 150) -> AsyncIterator[str]:
+        if not self.base_url:
+            raise ProviderError("Ollama API not configured")
+        session = get_http_session()
+        async with session.post(
+            f"{self.base_url}/api/generate",
+            json=self._request(prompt, system, max_tokens, True)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise ProviderError(f"Error calling Ollama API: {response.status} - {error_text}")
+
+            # Ollama streams one JSON object per line
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ProviderError(f"Error calling Ollama API: {chunk['error']}")
+                token = chunk.get("response", "")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    # The final chunk carries the token counts and durations
+                    record_ollama_usage(chunk)
+                    break
+
+    async def warm_up(self) -> None:
+        # A request without a prompt only loads the model (and sets keep_alive)
+        if not self.base_url:
+            raise ProviderError("Ollama API not configured")
+        session = get_http_session()
+        async with session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "stream": False, "keep_alive": self.keep_alive}
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise ProviderError(f"Error loading the Ollama model: {response.status} - {error_text}")
+            record_ollama_usage(await response.json())
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Chat completions over the shared AsyncOpenAI client: OpenAI itself or
+    any server with the same API (vLLM, llama.cpp, LM Studio, ...)
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_MODEL, base_url: str = OPENAI_BASE_URL):
+        super().__init__(model, base_url)
+        self.base_url = base_url
+
+    def _messages(self, prompt: str, system: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def complete(self, prompt: str, system: str, max_tokens: int = 150, json_schema: Optional[Dict[str, Any]] = None) -> str:
+        # json_object mode is the structured output option most compatible
+        # servers support; the prompt itself describes the expected keys
+        extra = {"response_format": {"type": "json_object"}} if json_schema is not None else {}
+        try:
+            completion = await get_openai_client(self.base_url).chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system),
+                max_tokens=max_tokens,
+                temperature=0.7,
+                **extra
+            )
+        except Exception as e:
+            raise ProviderError(f"Error calling OpenAI-compatible API: {e}") from e
+        return completion.choices[0].message.content or ""
+
+    async def stream(self, prompt: str, system: str, max_tokens: int = 150) -> AsyncIterator[str]:
+        try:
+            chunks = await get_openai_client(self.base_url).chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system),
+                max_tokens=max_tokens,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise ProviderError(f"Error calling OpenAI-compatible API: {e}") from e
+
+
+class StaticProvider(LLMProvider):
+    """
+    Always answers with the fixed fallback explanation; for running without
+    any LLM (offline use, tests, load tests of the rest of the pipeline)
+    """
+
+    name = "static"
+
+    def __init__(self, text: str = FALLBACK_EXPLANATION):
+        super().__init__("fallback")
+        self.text = text
+
+    async def complete(self, prompt: str, system: str, max_tokens: int = 150, json_schema: Optional[Dict[str, Any]] = None) -> str:
+        if json_schema is not None:
+            # Structured callers get a parseable single-phrase answer
+            return json.dumps({"explanation": self.text, "severity": DEFAULT_SEVERITY})
+        return self.text
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. While open, allow() is False until
+    reset_timeout has passed; then one probe call is allowed, and its
+    outcome closes the breaker again or keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0 or self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold > 0 and (self._probing or self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """
+        Forget an allowed call that was cancelled before it finished
+        """
+        self._probing = False
+
+
+# Absolute time (time.monotonic) by which the current request's LLM calls must finish
+_request_deadline: ContextVar[Optional[float]] = ContextVar("safespell_llm_deadline", default=None)
+
+
+def start_request_deadline(budget: float = LLM_REQUEST_BUDGET) -> None:
+    """
+    Give the LLM calls of the current request `budget` seconds in total
+    (0 = no request-wide limit). Tasks spawned from the request share it.
+    """
+    _request_deadline.set(time.monotonic() + budget if budget > 0 else None)
+
+
+def _call_timeout(timeout: float) -> Optional[float]:
+    """
+    Seconds the next call may take: the per-call timeout, capped by what is
+    left of the request budget
+    """
+    limit = timeout if timeout > 0 else None
+    deadline = _request_deadline.get()
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ProviderError("Request latency budget exhausted")
+        limit = remaining if limit is None else min(limit, remaining)
+    return limit
+
+
+class ResilientProvider(LLMProvider):
+    """
+    Puts a deadline on every call to `primary`, optionally hedges it with a
+    call to `hedge` after hedge_delay seconds (first success wins), and keeps
+    a circuit breaker per backend (model and server) so unhealthy ones fail fast.
+    """
+
+    name = "resilient"
+
+    def __init__(
+        self,
+        primary: LLMProvider,
+        hedge: Optional[LLMProvider] = None,
+        hedge_delay: float = LLM_HEDGE_DELAY,
+        timeout: float = LLM_TIMEOUT,
+        breaker_failures: int = LLM_BREAKER_FAILURES,
+        breaker_reset: float = LLM_BREAKER_RESET_SECONDS,
+    ):
+        super().__init__(primary.model)
+        self.primary = primary
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.backends = [backend for backend in (primary, hedge) if backend is not None]
+        self.breakers = {backend.backend_id: CircuitBreaker(breaker_failures, breaker_reset) for backend in self.backends}
+
+    @property
+    def model_id(self) -> str:
+        # Explanations are cached under the primary backend's model
+        return self.primary.model_id
+
+    def breaker_states(self) -> Dict[str, str]:
+        return {backend_id: breaker.state for backend_id, breaker in self.breakers.items()}
+
+    async def warm_up_backends(self, timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Warm up every backend concurrently; returns "ok" or the error per backend
+        """
+        async def warm(backend: LLMProvider) -> str:
+            try:
+                await asyncio.wait_for(backend.warm_up(), timeout)
+            except asyncio.TimeoutError:
+                return f"timed out after {timeout}s"
+            except Exception as e:
+                return f"error: {e}"
+            return "ok"
+
+        results = await asyncio.gather(*(warm(backend) for backend in self.backends))
+        return {backend.backend_id: result for backend, result in zip(self.backends, results)}
+
+    async def _attempt(self, backend: LLMProvider, call: Callable[[LLMProvider], Awaitable[str]], timeout: Optional[float]) -> str:
+        breaker = self.breakers[backend.backend_id]
+        try:
+            result = await asyncio.wait_for(call(backend), timeout)
+        except asyncio.CancelledError:
+            # Lost a hedge race or the request went away: not the backend's fault
+            breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "timeout")
+            raise ProviderError(f"{backend.backend_id} did not answer within {timeout:.1f}s")
+        except Exception as e:
+            breaker.record_failure()
+            LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "error")
+            raise e if isinstance(e, ProviderError) else ProviderError(str(e))
+        breaker.record_success()
+        LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "ok")
+        return result
+
+    def _available(self, limit: int) -> List[LLMProvider]:
+        """
+        Up to `limit` backends whose breaker lets a call through, in order
+        """
+        available = []
+        for backend in self.backends:
+            if len(available) == limit:
+                break
+            if self.breakers[backend.backend_id].allow():
+                available.append(backend)
+            else:
+                LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "circuit_open")
+        if not available:
+            raise CircuitOpenError("All LLM backends are unavailable (circuit open)")
+        return available
+
+    async def complete(self, prompt: str, system: str, max_tokens: int = 150, json_schema: Optional[Dict[str, Any]] = None) -> str:
+        timeout = _call_timeout(self.timeout)
+        available = self._available(limit=2)
+        call = lambda backend: backend.complete(prompt, system, max_tokens, json_schema)
+
+        first = asyncio.ensure_future(self._attempt(available[0], call, timeout))
+        pending = {first}
+        hedged = len(available) == 1
+        error: Optional[BaseException] = None
+        try:
+            if len(available) == 1:
+                return await first
+
+            # Give the first backend hedge_delay seconds on its own, then race
+            # the second one against it
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+            if first in done and first.exception() is None:
+                return first.result()
+            hedged = True
+            LLM_PROVIDER_CALLS.inc(1, available[1].backend_id, "hedge")
+            pending.add(asyncio.ensure_future(self._attempt(available[1], call, _call_timeout(self.timeout))))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also when the caller is cancelled while waiting: no call is left running
+            for task in pending:
+                task.cancel()
+            if not hedged:
+                # The hedge was never sent
+                self.breakers[available[1].backend_id].release()
+
+    async def stream(self, prompt: str, system: str, max_tokens: int = 150) -> AsyncIterator[str]:
+        # A stream cannot be hedged once tokens have been sent, so it goes
+        # to the first healthy backend only
+        timeout = _call_timeout(self.timeout)
+        backend = self._available(limit=1)[0]
+        breaker = self.breakers[backend.backend_id]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pieces = backend.stream(prompt, system, max_tokens).__aiter__()
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    piece = await asyncio.wait_for(pieces.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                yield piece
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "timeout")
+            raise ProviderError(f"{backend.backend_id} did not finish within {timeout:.1f}s")
+        except Exception as e:
+            breaker.record_failure()
+            LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "error")
+            raise e if isinstance(e, ProviderError) else ProviderError(str(e))
+        finally:
+            await pieces.aclose()
+            breaker.release()
+        breaker.record_success()
+        LLM_PROVIDER_CALLS.inc(1, backend.backend_id, "ok")
+
+
+def build_provider(name: str, base_url: str = "", model: str = "") -> LLMProvider:
+    """
+    Create a backend from its configuration name, optionally on another
+    server or with another model than configured for that type
+    """
+    if name == "ollama":
+        return OllamaProvider(base_url or OLLAMA_BASE_URL, model or OLLAMA_MODEL)
+    if name == "openai":
+        return OpenAICompatibleProvider(model or OPENAI_MODEL, base_url or OPENAI_BASE_URL)
+    if name == "static":
+        return StaticProvider()
+    raise ValueError(f"Unknown LLM provider {name!r}; expected ollama, openai or static")
+
+
+_provider: Optional[ResilientProvider] = None
+
+
+def get_provider() -> ResilientProvider:
+    """
+    Return the process-wide provider selected by LLM_PROVIDER (and
+    LLM_HEDGE_PROVIDER), wrapped with deadlines and circuit breakers
+    """
+    global _provider
+    if _provider is None:
+        _provider = ResilientProvider(
+            build_provider(LLM_PROVIDER),
+            hedge=build_provider(LLM_HEDGE_PROVIDER, LLM_HEDGE_BASE_URL, LLM_HEDGE_MODEL) if LLM_HEDGE_PROVIDER else None
+        )
+    return _provider
+
+
+def set_provider(provider: Optional[ResilientProvider]) -> None:
+    """
+    Replace the process-wide provider (None = rebuild from configuration on next use)
+    """
+    global _provider
+    _provider = provider
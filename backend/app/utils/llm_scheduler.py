@@ -0,0 +1,263 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+from dotenv import load_dotenv
+
+from app.utils.metrics import record_stage, LLM_QUEUE_WAIT, LLM_MERGED
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of LLM calls in flight across the whole process; match it to
+# what the Ollama box can serve in parallel (OLLAMA_NUM_PARALLEL)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# When both lanes are waiting, this many interactive calls start for every bulk one
+LLM_INTERACTIVE_WEIGHT = int(os.getenv("LLM_INTERACTIVE_WEIGHT", 4))
+# How long (milliseconds) a new keyed call waits before queuing, so identical
+# calls from other requests arriving meanwhile share its result
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", 10))
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+T = TypeVar("T")
+
+# Lane and client of the current HTTP request, set by the middleware
+_lane: ContextVar[str] = ContextVar("safespell_llm_lane", default=INTERACTIVE)
+_client: ContextVar[str] = ContextVar("safespell_llm_client", default="")
+
+
+def set_request_lane(lane: str, client: str = "") -> None:
+    """
+    Schedule the LLM calls of the current request (and the tasks it spawns)
+    in `lane`, sharing that lane fairly with other clients
+    """
+    if lane not in LANES:
+        raise ValueError(f"lane must be one of {', '.join(LANES)}")
+    _lane.set(lane)
+    _client.set(client)
+
+
+class _Ticket:
+    """
+    A call waiting for a slot
+    """
+
+    __slots__ = ("lane", "client", "granted", "enqueued_at")
+
+    def __init__(self, lane: str, client: str):
+        self.lane = lane
+        self.client = client
+        self.granted: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+
+class _Lane:
+    """
+    Waiting tickets of one priority lane, one FIFO per client, served round-robin
+    """
+
+    def __init__(self):
+        self.clients: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self.depth = 0
+
+    def push(self, ticket: _Ticket) -> None:
+        self.clients.setdefault(ticket.client, deque()).append(ticket)
+        self.depth += 1
+
+    def pop(self) -> Optional[_Ticket]:
+        if not self.clients:
+            return None
+        client, tickets = next(iter(self.clients.items()))
+        ticket = tickets.popleft()
+        if tickets:
+            self.clients.move_to_end(client)
+        else:
+            del self.clients[client]
+        self.depth -= 1
+        return ticket
+
+    def remove(self, ticket: _Ticket) -> bool:
+        tickets = self.clients.get(ticket.client)
+        if tickets is None or ticket not in tickets:
+            return False
+        tickets.remove(ticket)
+        if not tickets:
+            del self.clients[ticket.client]
+        self.depth -= 1
+        return True
+
+
+class _Job:
+    """
+    A keyed call and everyone waiting for its result
+    """
+
+    __slots__ = ("lane", "ticket", "future")
+
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.ticket: Optional[_Ticket] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of the LLM provider. At most max_concurrency
+    calls are outstanding; waiting calls are queued in an interactive and a
+    bulk lane, and inside each lane clients take turns, so one client's big
+    batch cannot starve everyone else. Identical keyed calls are merged: a
+    call joining one that is pending or running gets the same result, and an
+    interactive caller moves a queued bulk call into its own lane.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        interactive_weight: int = LLM_INTERACTIVE_WEIGHT,
+        batch_window: float = LLM_BATCH_WINDOW_MS / 1000,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.interactive_weight = max(1, interactive_weight)
+        self.batch_window = max(0.0, batch_window)
+        self.outstanding = 0
+        self._lanes = {lane: _Lane() for lane in LANES}
+        self._interactive_streak = 0
+        self._jobs: Dict[Hashable, _Job] = {}
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        interactive, bulk = self._lanes[INTERACTIVE], self._lanes[BULK]
+        if interactive.depth and (not bulk.depth or self._interactive_streak < self.interactive_weight):
+            self._interactive_streak += 1
+            return interactive.pop()
+        self._interactive_streak = 0
+        return bulk.pop()
+
+    def _dispatch(self) -> None:
+        while self.outstanding < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            self.outstanding += 1
+            ticket.granted.set_result(None)
+
+    def _record_wait(self, lane: str, seconds: float) -> None:
+        LLM_QUEUE_WAIT.observe(seconds, lane)
+        record_stage("llm_queue", seconds)
+
+    async def _acquire(self, ticket: _Ticket) -> None:
+        if self.outstanding < self.max_concurrency and not any(lane.depth for lane in self._lanes.values()):
+            self.outstanding += 1
+            self._record_wait(ticket.lane, 0.0)
+            return
+        self._lanes[ticket.lane].push(ticket)
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket.granted.done() and not ticket.granted.cancelled():
+                # Granted just before the cancellation arrived: hand it on
+                self._release()
+            else:
+                self._lanes[ticket.lane].remove(ticket)
+            raise
+        self._record_wait(ticket.lane, time.perf_counter() - ticket.enqueued_at)
+
+    def _release(self) -> None:
+        self.outstanding -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Hold one LLM slot for the duration of the block (for streamed calls,
+        which cannot be merged)
+        """
+        await self._acquire(_Ticket(lane or _lane.get(), _client.get()))
+        try:
+            yield
+        finally:
+            self._release()
+
+    def promote(self, key: Hashable) -> None:
+        """
+        Move the pending call for key into the current request's lane if that
+        has priority (an interactive request waiting on a queued bulk call)
+        """
+        job = self._jobs.get(key)
+        if job is None or job.lane == INTERACTIVE or _lane.get() != INTERACTIVE:
+            return
+        job.lane = INTERACTIVE
+        ticket = job.ticket
+        if ticket is not None and self._lanes[BULK].remove(ticket):
+            ticket.lane = INTERACTIVE
+            self._lanes[INTERACTIVE].push(ticket)
+            self._dispatch()
+
+    async def run(self, factory: Callable[[], Awaitable[T]], key: Optional[Hashable] = None) -> T:
+        """
+        Run factory() once a slot is free. Calls with the same key that
+        overlap in time run factory only once; failures are raised to
+        every merged caller.
+        """
+        if key is None:
+            async with self.slot():
+                return await factory()
+
+        job = self._jobs.get(key)
+        if job is not None:
+            LLM_MERGED.inc(1, _lane.get())
+            self.promote(key)
+            try:
+                return await asyncio.shield(job.future)
+            except asyncio.CancelledError:
+                # The caller driving the job was cancelled, not us: try again
+                if job.future.cancelled():
+                    return await self.run(factory, key)
+                raise
+
+        job = self._jobs[key] = _Job(_lane.get())
+        try:
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            job.ticket = _Ticket(job.lane, _client.get())
+            await self._acquire(job.ticket)
+            try:
+                result = await factory()
+            finally:
+                self._release()
+            job.future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            job.future.set_exception(e)
+            # Nobody else may be waiting; don't let asyncio log an unretrieved exception
+            job.future.exception()
+            raise
+        finally:
+            del self._jobs[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Outstanding calls and, per lane, waiting calls and waiting clients
+        """
+        return {
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "pending_keys": len(self._jobs),
+            "lanes": {
+                name: {"depth": lane.depth, "clients": len(lane.clients)}
+                for name, lane in self._lanes.items()
+            }
+        }
+
+
+# Process-wide scheduler used by the explanation helpers
+llm_scheduler = LLMScheduler()
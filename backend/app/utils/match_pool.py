@@ -0,0 +1,145 @@
+import os
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+
+from app.models.lexicon import get_lexicon, phrase_info
+from app.models.phrase_matcher import PhraseMatcher
+
+# Load environment variables
+load_dotenv()
+
+# Texts up to this many characters are matched inline on the event loop;
+# longer ones go to the worker pool
+MATCH_INLINE_MAX_CHARS = int(os.getenv("MATCH_INLINE_MAX_CHARS", 20_000))
+# "thread" or "process" workers, and how many
+MATCH_EXECUTOR = os.getenv("MATCH_EXECUTOR", "thread")
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", 2))
+# Jobs allowed in the pool (running + waiting) before new ones are rejected
+MATCH_QUEUE_SIZE = int(os.getenv("MATCH_QUEUE_SIZE", 16))
+# Retry-After (seconds) sent with a rejection
+MATCH_RETRY_AFTER = int(os.getenv("MATCH_RETRY_AFTER", 1))
+
+
+class MatchPoolFullError(Exception):
+    """
+    The matching pool has MATCH_QUEUE_SIZE jobs already; try again later
+    """
+
+    def __init__(self, retry_after: int = MATCH_RETRY_AFTER):
+        super().__init__("Server is busy matching other texts; retry later")
+        self.retry_after = retry_after
+
+
+T = TypeVar("T")
+
+# Matcher loaded into each worker process by _init_worker
+_worker_matcher: Optional[PhraseMatcher] = None
+
+
+def _init_worker(state: Tuple[Any, ...]) -> None:
+    global _worker_matcher
+    _worker_matcher = PhraseMatcher.from_state(state)
+
+
+def _find_in_worker(text: str) -> List[Tuple[int, int, int]]:
+    # Only offsets and phrase indices travel back; the parent slices the phrases itself
+    return _worker_matcher.find_all(text)
+
+
+def _to_phrases(text: str, matches: List[Tuple[int, int, int]], severities: List[Optional[int]]) -> List[Dict[str, Any]]:
+    return [phrase_info(text, start, end, severities[index]) for start, end, index in matches]
+
+
+class MatchPool:
+    """
+    Runs phrase matching for large texts off the event loop, in a bounded
+    pool of threads or processes. Process workers get the compiled matcher
+    once at start-up; the pool is replaced when the lexicon changes.
+    """
+
+    def __init__(
+        self,
+        workers: int = MATCH_WORKERS,
+        queue_size: int = MATCH_QUEUE_SIZE,
+        executor: str = MATCH_EXECUTOR,
+        inline_max_chars: int = MATCH_INLINE_MAX_CHARS,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError("MATCH_EXECUTOR must be 'thread' or 'process'")
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.executor = executor
+        self.inline_max_chars = inline_max_chars
+        self.pending = 0
+        self._pool: Optional[Executor] = None
+        self._pool_version: Optional[str] = None
+
+    def _admit(self) -> None:
+        if self.pending >= self.queue_size:
+            raise MatchPoolFullError()
+        self.pending += 1
+
+    def _get_pool(self, lexicon: Any) -> Executor:
+        if self.executor == "thread":
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="safespell-match")
+            return self._pool
+
+        if self._pool is None or self._pool_version != lexicon.version:
+            # Jobs already submitted finish on the old pool with the old lexicon
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = ProcessPoolExecutor(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(lexicon.matcher.to_state(),)
+            )
+            self._pool_version = lexicon.version
+        return self._pool
+
+    async def find(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Same result as get_abusive_phrases(text). Raises MatchPoolFullError
+        instead of queuing when the pool is saturated.
+        """
+        lexicon = get_lexicon()
+        if len(text) <= self.inline_max_chars:
+            return _to_phrases(text, lexicon.matcher.find_all(text), lexicon.severities)
+
+        self._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool(lexicon)
+            if self.executor == "process":
+                matches = await loop.run_in_executor(pool, _find_in_worker, text)
+            else:
+                matches = await loop.run_in_executor(pool, lexicon.matcher.find_all, text)
+        finally:
+            self.pending -= 1
+        return _to_phrases(text, matches, lexicon.severities)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run other per-text work (e.g. the prescreen) off the event loop under
+        the same admission limit as find(). Uses the thread pool, or a thread
+        of its own when the pool runs processes (func need not be picklable).
+        Raises MatchPoolFullError when the pool is saturated.
+        """
+        self._admit()
+        try:
+            if self.executor == "thread":
+                return await asyncio.get_running_loop().run_in_executor(self._get_pool(None), func, *args)
+            return await asyncio.to_thread(func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._pool_version = None
+
+
+match_pool = MatchPool()
@@ -0,0 +1,197 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in Prometheus text format
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative histogram with optional labels, rendered in Prometheus text format
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    labels = _format_labels(self.labelnames, labelvalues, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics plus callbacks that produce extra lines at scrape time
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "safespell_request_duration_seconds", "End-to-end HTTP request latency", ["path", "status"]
+))
+STAGE_LATENCY = registry.register(Histogram(
+    "safespell_stage_duration_seconds", "Latency of each analysis stage (match, llm_queue, llm_generate, serialize)", ["stage"]
+))
+FLAGGED_PHRASES = registry.register(Histogram(
+    "safespell_flagged_phrases", "Flagged phrases per analyzed text", [], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+))
+REJECTED_REQUESTS = registry.register(Counter(
+    "safespell_rejected_requests_total", "Requests turned away by admission control", ["reason"]
+))
+LLM_CALLS = registry.register(Counter(
+    "safespell_llm_calls_total", "LLM calls by kind and outcome", ["kind", "outcome"]
+))
+LLM_PROVIDER_CALLS = registry.register(Counter(
+    "safespell_llm_provider_calls_total", "Calls per LLM backend by outcome (ok, error, timeout, circuit_open, hedge)", ["provider", "outcome"]
+))
+LLM_QUEUE_WAIT = registry.register(Histogram(
+    "safespell_llm_queue_wait_seconds", "Time LLM calls waited for a slot, per scheduler lane", ["lane"]
+))
+LLM_MERGED = registry.register(Counter(
+    "safespell_llm_merged_calls_total", "LLM calls merged into an identical pending call, per lane of the joining request", ["lane"]
+))
+OLLAMA_EVAL_TOKENS = registry.register(Counter(
+    "safespell_ollama_eval_tokens_total", "Tokens generated by Ollama (eval_count)"
+))
+OLLAMA_DURATIONS = registry.register(Histogram(
+    "safespell_ollama_duration_seconds", "Durations reported by Ollama (eval, prompt_eval, load, total)", ["phase"]
+))
+
+# Stage durations of the current HTTP request, for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("safespell_request_timings", default=None)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """
+    Begin collecting stage timings for the current request. Tasks spawned
+    from the request share the returned dict.
+    """
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """
+    Record a stage duration in the histogram and in the current request's
+    timings (summed when a stage runs more than once, e.g. per LLM call)
+    """
+    STAGE_LATENCY.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """
+    Format timings (seconds) as a Server-Timing header value (milliseconds)
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+def record_ollama_usage(result: Dict[str, Any]) -> None:
+    """
+    Keep the token count and durations Ollama reports with every final
+    response (durations are in nanoseconds)
+    """
+    eval_count = result.get("eval_count")
+    if isinstance(eval_count, int):
+        OLLAMA_EVAL_TOKENS.inc(eval_count)
+    for phase in ("eval", "prompt_eval", "load", "total"):
+        duration = result.get(f"{phase}_duration")
+        if isinstance(duration, (int, float)):
+            OLLAMA_DURATIONS.observe(duration / 1e9, phase)
@@ -1,56 +1,206 @@
 import os
-import aiohttp
-import json
+from typing import AsyncIterator, Dict, Any, List, Optional
 from dotenv import load_dotenv
 
+from app.utils.llm_provider import get_provider, StaticProvider, FALLBACK_EXPLANATION
+from app.utils.explanation_cache import explanation_cache, normalize_phrase
+from app.utils.llm_scheduler import llm_scheduler
+from app.utils.response_parsing import parse_explanation, parse_explanation_list
+from app.utils.metrics import stage_timer, LLM_CALLS
+
 # Load environment variables
 load_dotenv()
 
-# Configure Ollama API
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-MODEL_NAME = os.getenv("MODEL_NAME", "llama3.2")
+# Characters of surrounding text sent with each phrase in document mode
+DOCUMENT_CONTEXT_CHARS = int(os.getenv("DOCUMENT_CONTEXT_CHARS", 120))
+
+# JSON schema of the structured answer in document mode (Ollama's `format` option)
+DOCUMENT_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "explanation": {"type": "string"},
+                    "severity": {"type": "integer", "minimum": 1, "maximum": 5}
+                },
+                "required": ["id", "explanation", "severity"]
+            }
+        }
+    },
+    "required": ["results"]
+}
+
+# Bump whenever the prompt below changes so cached explanations are regenerated
+PROMPT_VERSION = "1"
+
+SYSTEM_PROMPT = "You are a helpful assistant that explains why certain phrases might be considered manipulative, abusive, or gaslighting in a gentle, empathetic way."
+
+# JSON schema of a single-phrase answer that also carries a severity
+PHRASE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "explanation": {"type": "string"},
+        "severity": {"type": "integer", "minimum": 1, "maximum": 5}
+    },
+    "required": ["explanation", "severity"]
+}
+
+def _explanation_prompt(phrase: str) -> str:
+    """
+    Prompt used to explain a single phrase
+    """
+    return f"""The phrase \"{phrase}\" could be considered manipulative, abusive, or gaslighting. 
+    Please provide a brief, empathetic explanation (2-3 sentences) of why this language might be harmful 
+    in a relationship or conversation. Focus on how it might make the recipient feel and why it's problematic.
+    Keep your response under 150 words and be gentle but clear."""
+
+async def _generate_explanation(phrase: str) -> str:
+    """
+    Ask the configured LLM provider for a fresh explanation; raises if the call fails
+    """
+    with stage_timer("llm_generate"):
+        try:
+            explanation = await get_provider().complete(_explanation_prompt(phrase), SYSTEM_PROMPT, max_tokens=150)
+        except Exception:
+            LLM_CALLS.inc(1, "explain", "error")
+            raise
+    LLM_CALLS.inc(1, "explain", "ok")
+    explanation = explanation.strip()
+    if not explanation:
+        raise RuntimeError("LLM returned an empty explanation")
+    return explanation
+
+def is_fallback(explanation: str) -> bool:
+    """
+    Whether explanation stands in for one the LLM failed to give. With
+    LLM_PROVIDER=static the fixed text is the intended answer, so only the
+    ones carrying an error count.
+    """
+    if not explanation.startswith(FALLBACK_EXPLANATION):
+        return False
+    return explanation != FALLBACK_EXPLANATION or not isinstance(get_provider().primary, StaticProvider)
+
+def explanation_cache_key(phrase: str) -> tuple:
+    """
+    Cache key for a phrase: normalized text, model and prompt version
+    """
+    return (normalize_phrase(phrase), get_provider().model_id, PROMPT_VERSION)
 
 async def get_gpt_explanation(phrase: str) -> str:
     """
-    Get an explanation from Ollama about why a phrase might be considered abusive or manipulative
+    Get an explanation from the configured LLM provider about why a phrase might be considered abusive or manipulative.
+    Explanations are cached per normalized phrase, so repeated phrases skip the LLM.
+    Cache misses wait for a slot in the LLM scheduler.
     """
     try:
-        # Check if Ollama base URL is available
-        if not OLLAMA_BASE_URL:
-            return "Ollama API not configured. This is a placeholder explanation for why the phrase might be considered harmful or manipulative."
-        
-        # Create a prompt for Ollama
-        prompt = f"""The phrase \"{phrase}\" could be considered manipulative, abusive, or gaslighting. 
-        Please provide a brief, empathetic explanation (2-3 sentences) of why this language might be harmful 
-        in a relationship or conversation. Focus on how it might make the recipient feel and why it's problematic.
-        Keep your response under 150 words and be gentle but clear."""
-        
-        # Call the Ollama API
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": MODEL_NAME,
-                    "prompt": prompt,
-                    "system": "You are a helpful assistant that explains why certain phrases might be considered manipulative, abusive, or gaslighting in a gentle, empathetic way.",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "num_predict": 150
-                    }
-                }
-            ) as response:
-                # Check if the request was successful
-                if response.status == 200:
-                    # Extract and return the explanation
-                    result = await response.json()
-                    explanation = result.get("response", "").strip()
-                    return explanation
-                else:
-                    # Return error message
-                    error_text = await response.text()
-                    return f"Error calling Ollama API: {response.status} - {error_text}"
-    
+        key = explanation_cache_key(phrase)
+        # Concurrent misses are coalesced by the cache; if another request's
+        # bulk call for this phrase is still queued, move it up for us
+        llm_scheduler.promote(key)
+        return await explanation_cache.get_or_create(
+            key,
+            lambda: llm_scheduler.run(lambda: _generate_explanation(key[0]), key=key)
+        )
+
     except Exception as e:
-        # Fallback explanation if API call fails
-        return f"This phrase may be considered harmful because it could invalidate someone's feelings or experiences. It's important to use language that respects others' perspectives and emotions. (Error: {str(e)})"
\ No newline at end of file
+        # Fallback explanation if the call fails, times out or the backend is unavailable
+        return f"{FALLBACK_EXPLANATION} (Error: {str(e)})"
+
+async def stream_gpt_explanation(phrase: str) -> AsyncIterator[str]:
+    """
+    Yield an explanation piece by piece as the provider generates it.
+    A cached explanation is yielded in one piece; a freshly streamed one is
+    cached once complete. Raises if the call fails.
+    """
+    key = explanation_cache_key(phrase)
+    cached = explanation_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    try:
+        async with llm_scheduler.slot():
+            async for token in get_provider().stream(_explanation_prompt(key[0]), SYSTEM_PROMPT, max_tokens=150):
+                parts.append(token)
+                yield token
+    except Exception:
+        LLM_CALLS.inc(1, "stream", "error")
+        raise
+    LLM_CALLS.inc(1, "stream", "ok")
+
+    explanation = "".join(parts).strip()
+    if explanation:
+        explanation_cache.put(key, explanation)
+
+async def get_explanation_with_severity(phrase: str) -> Dict[str, Any]:
+    """
+    Explanation and 1-5 severity for one phrase from a single structured
+    call, as {"explanation", "severity"}. Raises if the call fails.
+    """
+    prompt = f"""Analyze this phrase: \"{phrase}\"
+    Provide a concise explanation of why it might be manipulative and a severity score from 1 (mild) to 5 (severe).
+    Respond in JSON format with keys "explanation" and "severity"."""
+
+    async def generate() -> str:
+        with stage_timer("llm_generate"):
+            try:
+                content = await get_provider().complete(prompt, SYSTEM_PROMPT, max_tokens=200, json_schema=PHRASE_RESPONSE_SCHEMA)
+            except Exception:
+                LLM_CALLS.inc(1, "severity", "error")
+                raise
+        LLM_CALLS.inc(1, "severity", "ok")
+        return content
+
+    # Identical phrases asked for at the same time share one call
+    content = await llm_scheduler.run(generate, key=("severity",) + explanation_cache_key(phrase))
+    return parse_explanation(content)
+
+async def get_document_explanations(text: str, phrases: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Explain every flagged phrase of one document with a single structured
+    LLM call. `phrases` are the matches from get_abusive_phrases; each is
+    sent with some surrounding context. Returns one {"explanation", "severity"}
+    dict per phrase, or None for entries the model left out or malformed.
+    Raises if the call itself fails.
+    """
+    if not phrases:
+        return []
+
+    lines = []
+    for index, phrase_info in enumerate(phrases):
+        start = max(0, phrase_info["start_index"] - DOCUMENT_CONTEXT_CHARS)
+        end = min(len(text), phrase_info["end_index"] + DOCUMENT_CONTEXT_CHARS)
+        context = " ".join(text[start:end].split())
+        lines.append(f'{index}. "{phrase_info["phrase"]}" (context: "...{context}...")')
+    phrase_list = "\n".join(lines)
+
+    prompt = f"""The following phrases were flagged in a conversation as possibly manipulative, abusive, or gaslighting.
+    For each phrase, give a brief, empathetic explanation (2-3 sentences) of why this language might be harmful
+    in context, and a severity score from 1 (mild) to 5 (severe). Be gentle but clear.
+    Respond in JSON with a "results" list containing one object per phrase with keys "id", "explanation" and "severity".
+
+{phrase_list}"""
+
+    async def generate() -> str:
+        with stage_timer("llm_generate"):
+            try:
+                content = await get_provider().complete(
+                    prompt,
+                    SYSTEM_PROMPT,
+                    max_tokens=150 * len(phrases),
+                    json_schema=DOCUMENT_RESPONSE_SCHEMA
+                )
+            except Exception:
+                LLM_CALLS.inc(1, "document", "error")
+                raise
+        LLM_CALLS.inc(1, "document", "ok")
+        return content
+
+    content = await llm_scheduler.run(generate)
+
+    return parse_explanation_list(content, len(phrases))
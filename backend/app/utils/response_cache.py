@@ -0,0 +1,115 @@
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Total size in bytes of cached /analyze response bodies (0 = disabled)
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", 0))
+
+
+def response_cache_key(text: str, versions: Iterable[str]) -> str:
+    """
+    Content hash of the input text together with everything else the
+    response depends on (mode, format, lexicon, model and prompt versions)
+    """
+    digest = hashlib.sha256()
+    for part in versions:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def etag_for(key: str) -> str:
+    """
+    Weak validator: the key covers the input and versions, but LLM
+    explanations are not byte-for-byte reproducible
+    """
+    return f'W/"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header value lists etag (weak comparison).
+    "*" never matches: /analyze is a POST, and for unsafe methods "*" is
+    not a claim to hold the response (RFC 9110, section 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate != "*" and candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized response bodies (with their media type),
+    bounded by their total size in bytes. Only used from the event loop, so
+    it needs no locking. Keys embed the lexicon/model versions; when those
+    change the old entries can never be hit again, so they are dropped at once.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._versions: Optional[tuple] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def check_versions(self, versions: tuple) -> None:
+        """
+        Drop every entry if the lexicon or model version changed
+        """
+        if versions != self._versions:
+            self.clear()
+            self._versions = versions
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: str, body: Tuple[bytes, str]) -> None:
+        # A single response larger than the whole budget is not worth keeping
+        if not self.enabled or len(body[0]) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous[0])
+        self._entries[key] = body
+        self.size += len(body[0])
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted[0])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+response_cache = ResponseCache()
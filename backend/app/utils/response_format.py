@@ -0,0 +1,105 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.explanation_cache import normalize_phrase
+
+# Optional faster encoders; the compact format falls back to the standard
+# json module, and MessagePack is only offered when msgpack is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COMPACT_JSON_MEDIA_TYPE = "application/vnd.safespell.compact+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# ?format= values
+FORMATS = ("json", "compact", "msgpack")
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str]) -> str:
+    """
+    Pick the response format from ?format= or, failing that, the Accept
+    header. Raises ValueError for an unknown or unavailable format.
+    """
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        chosen = requested
+    else:
+        accept = (accept or "").lower()
+        if msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+            chosen = "msgpack"
+        elif COMPACT_JSON_MEDIA_TYPE in accept:
+            chosen = "compact"
+        else:
+            chosen = "json"
+    if chosen == "msgpack" and msgpack is None:
+        raise ValueError("MessagePack is not available on this server (msgpack is not installed)")
+    return chosen
+
+
+def build_compact_response(
+    abusive_phrases: List[Dict[str, Any]],
+    explanations: List[str],
+    severities: Optional[List[Optional[int]]],
+    severity_score: int
+) -> Dict[str, Any]:
+    """
+    Compact /analyze body: no echoed text, each distinct phrase and its
+    explanation stored once, and the spans as parallel integer arrays:
+
+        {"severity_score": 3,
+         "phrases": ["you're overreacting"], "explanations": ["..."],
+         "starts": [0, 40], "ends": [19, 59], "ids": [0, 0],
+         "severities": [4, 4] (null when no span has one)}
+
+    Span i covers text[starts[i]:ends[i]] and is explained by
+    explanations[ids[i]]. A span's severity is the LLM's (document mode), or
+    else the lexicon's base severity for the phrase.
+    """
+    if severities is None:
+        severities = [None] * len(abusive_phrases)
+    severities = [
+        severity if severity is not None else phrase_info.get("severity")
+        for phrase_info, severity in zip(abusive_phrases, severities)
+    ]
+    # Keyed by explanation too: an occurrence that got a fallback keeps it
+    index_by_phrase: Dict[Tuple[str, str], int] = {}
+    phrases: List[str] = []
+    table: List[str] = []
+    ids: List[int] = []
+    for phrase_info, explanation in zip(abusive_phrases, explanations):
+        key = (normalize_phrase(phrase_info["phrase"]), explanation)
+        index = index_by_phrase.get(key)
+        if index is None:
+            index = index_by_phrase[key] = len(table)
+            phrases.append(key[0])
+            table.append(explanation)
+        ids.append(index)
+
+    return {
+        "severity_score": severity_score,
+        "phrases": phrases,
+        "explanations": table,
+        "starts": [phrase_info["start_index"] for phrase_info in abusive_phrases],
+        "ends": [phrase_info["end_index"] for phrase_info in abusive_phrases],
+        "ids": ids,
+        "severities": severities if any(severity is not None for severity in severities) else None
+    }
+
+
+def encode_compact(body: Dict[str, Any], response_format: str) -> Tuple[bytes, str]:
+    """
+    Serialize a compact body; returns (content, media type)
+    """
+    if response_format == "msgpack":
+        return msgpack.packb(body, use_bin_type=True), MSGPACK_MEDIA_TYPES[0]
+    if orjson is not None:
+        return orjson.dumps(body), COMPACT_JSON_MEDIA_TYPE
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), COMPACT_JSON_MEDIA_TYPE
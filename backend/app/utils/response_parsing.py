@@ -0,0 +1,74 @@
+import json
+from typing import Any, Dict, List, Optional
+
+# Used when the model returns a severity that is missing or out of range
+DEFAULT_SEVERITY = 3
+
+
+def _valid_severity(value: Any) -> bool:
+    """
+    Whether value is an integer severity from 1 to 5
+    """
+    return isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= 5
+
+
+def _parse_severity(value: Any) -> int:
+    """
+    Accept an integer severity from 1 to 5, otherwise fall back to the default
+    """
+    return value if _valid_severity(value) else DEFAULT_SEVERITY
+
+
+def parse_explanation(response_content: str) -> Dict[str, Any]:
+    """
+    Parse a single-phrase model response of the form
+    {"explanation": ..., "severity": ...}. Never fails: a response that isn't
+    valid JSON is returned as the explanation text with the default severity.
+    """
+    try:
+        data = json.loads(response_content)
+    except (json.JSONDecodeError, TypeError):
+        return {
+            "explanation": "Failed to parse AI model response. The raw response was: " + str(response_content),
+            "severity": DEFAULT_SEVERITY
+        }
+    if not isinstance(data, dict):
+        data = {}
+    return {
+        "explanation": data.get("explanation", "No explanation provided."),
+        "severity": _parse_severity(data.get("severity"))
+    }
+
+
+def parse_explanation_list(response_content: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    Parse a multi-phrase model response of the form
+    {"results": [{"id": 0, "explanation": ..., "severity": ...}, ...]} into a
+    list with one entry per phrase id (0 to count - 1). Entries that are
+    missing, duplicated, or lack a usable explanation or severity come back
+    as None so the caller can retry them individually.
+    """
+    parsed: List[Optional[Dict[str, Any]]] = [None] * count
+    try:
+        data = json.loads(response_content)
+    except (json.JSONDecodeError, TypeError):
+        return parsed
+
+    items = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return parsed
+
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("id")
+        explanation = item.get("explanation")
+        if not isinstance(index, int) or not (0 <= index < count) or index in seen:
+            continue
+        seen.add(index)
+        severity = item.get("severity")
+        if not isinstance(explanation, str) or not explanation.strip() or not _valid_severity(severity):
+            continue
+        parsed[index] = {"explanation": explanation.strip(), "severity": severity}
+    return parsed
@@ -0,0 +1,66 @@
+import os
+import time
+from typing import Any, Dict
+from dotenv import load_dotenv
+
+from app.models.lexicon import get_lexicon
+from app.models.prescreen import get_prescreen_model
+from app.utils.llm_provider import get_provider
+from app.utils.ollama_helper import get_gpt_explanation, is_fallback
+
+# Load environment variables
+load_dotenv()
+
+# Warm up at start-up (load the model, prime the explanation path) before
+# GET /ready reports ready; disable for tests or local development
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds to wait for each backend to load its model
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 120))
+
+
+class Readiness:
+    """
+    Start-up progress of this worker, reported by GET /ready
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.import_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.steps: Dict[str, Any] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "import_seconds": round(self.import_seconds, 3),
+            "warmup_seconds": round(self.warmup_seconds, 3),
+            "warmup": self.steps
+        }
+
+
+readiness = Readiness()
+
+
+async def warm_up() -> None:
+    """
+    Do the slow first-time work before traffic arrives: load the LLM model
+    (Ollama keeps it loaded for OLLAMA_KEEP_ALIVE), load the prescreen model
+    and run one explanation through the whole path (provider client, scheduler,
+    cache). A failed step is reported but does not keep the worker unready:
+    requests still work, with fallback explanations if the LLM is down.
+    """
+    started = time.perf_counter()
+    if WARMUP_ENABLED:
+        readiness.steps["model"] = await get_provider().warm_up_backends(WARMUP_TIMEOUT)
+        readiness.steps["prescreen"] = "loaded" if get_prescreen_model() is not None else "disabled"
+
+        entries = get_lexicon().entries
+        if entries:
+            explanation = await get_gpt_explanation(entries[0].phrase)
+            readiness.steps["explanation"] = "fallback" if is_fallback(explanation) else "ok"
+    else:
+        readiness.steps["skipped"] = "WARMUP_ENABLED is false"
+
+    readiness.warmup_seconds = time.perf_counter() - started
+    readiness.ready = True
+    print(f"Worker ready after {readiness.warmup_seconds:.2f}s of warm-up: {readiness.steps}")
@@ -0,0 +1 @@
+# Initialize the benchmarks package
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Local stand-in for Ollama's /api/generate, for load tests that must not
+touch a real model server. Latency, error rate and streaming speed are
+configurable; call counts are exposed at GET /stats.
+
+    python -m benchmarks.fake_ollama --port 11435 --latency lognormal --latency-mean 0.8
+"""
+import re
+import sys
+import math
+import json
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "exponential", "lognormal"]
+
+# Matches the numbered phrase list of a document-mode prompt
+_DOCUMENT_ITEM = re.compile(r'^\s*(\d+)\. "', re.MULTILINE)
+
+
+class FakeOllama:
+    """
+    aiohttp application emulating /api/generate (plain, streaming and
+    JSON-format requests)
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed",
+        latency_mean: float = 0.5,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        tokens: int = 40,
+        seed: Optional[int] = None,
+    ):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency must be one of {LATENCY_DISTRIBUTIONS}")
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.tokens = tokens
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def sample_latency(self) -> float:
+        """
+        Total generation time of one request, in seconds
+        """
+        mean = self.latency_mean
+        if self.latency == "uniform":
+            return self.rng.uniform(0, 2 * mean)
+        if self.latency == "exponential":
+            return self.rng.expovariate(1 / mean) if mean > 0 else 0.0
+        if self.latency == "lognormal":
+            # Parameterized so the distribution's mean equals latency_mean
+            if mean <= 0:
+                return 0.0
+            mu = math.log(mean) - self.latency_sigma ** 2 / 2
+            return self.rng.lognormvariate(mu, self.latency_sigma)
+        return mean
+
+    def _response_text(self, body: Dict[str, Any]) -> str:
+        if body.get("format"):
+            ids = [int(match) for match in _DOCUMENT_ITEM.findall(body.get("prompt", ""))]
+            return json.dumps({"results": [
+                {"id": index, "explanation": "This phrase can make someone doubt their own feelings.", "severity": 3}
+                for index in ids
+            ]})
+        words = ["This", "phrase", "can", "make", "someone", "doubt", "their", "own", "feelings."]
+        return " ".join(words[i % len(words)] for i in range(self.tokens))
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            latency = self.sample_latency()
+            if self.rng.random() < self.error_rate:
+                self.errors += 1
+                await asyncio.sleep(latency / 2)
+                return web.json_response({"error": "fake ollama: injected failure"}, status=500)
+
+            text = self._response_text(body)
+            stats = {
+                "eval_count": self.tokens,
+                "eval_duration": int(latency * 0.8e9),
+                "prompt_eval_duration": int(latency * 0.2e9),
+                "load_duration": 0,
+                "total_duration": int(latency * 1e9),
+            }
+            if not body.get("stream", True):
+                await asyncio.sleep(latency)
+                return web.json_response({"model": body.get("model"), "response": text, "done": True, **stats})
+
+            # Spread the latency over the tokens, one JSON object per line
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            pieces = text.split(" ")
+            for index, piece in enumerate(pieces):
+                await asyncio.sleep(latency / len(pieces))
+                token = piece if index == 0 else " " + piece
+                await response.write((json.dumps({"response": token, "done": False}) + "\n").encode())
+            await response.write((json.dumps({"response": "", "done": True, **stats}) + "\n").encode())
+            await response.write_eof()
+            return response
+        finally:
+            self.in_flight -= 1
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.snapshot())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+    def application(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+async def start_fake_ollama(fake: FakeOllama, host: str, port: int) -> web.AppRunner:
+    """
+    Start the fake server on the running loop; call runner.cleanup() to stop it
+    """
+    runner = web.AppRunner(fake.application())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_fake_ollama_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="mean generation latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="sigma of the lognormal distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per generated explanation")
+
+
+def fake_from_arguments(args: argparse.Namespace) -> FakeOllama:
+    return FakeOllama(
+        latency=args.latency,
+        latency_mean=args.latency_mean,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        tokens=args.tokens,
+        seed=args.seed,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a fake Ollama /api/generate server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--seed", type=int, default=None)
+    add_fake_ollama_arguments(parser)
+    args = parser.parse_args(argv)
+    web.run_app(fake_from_arguments(args).application(), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+End-to-end load test of the FastAPI app in app/main.py against a local fake
+Ollama server. The app runs under uvicorn in a subprocess pointed at the
+fake; requests are driven either closed-loop (--concurrency) or open-loop
+at a target rate (--rps).
+
+Run from the backend directory:
+
+    python -m benchmarks.loadtest --concurrency 32 --duration 30
+    python -m benchmarks.loadtest --rps 50 --duration 60 --latency-mean 1.5 --error-rate 0.02
+    python -m benchmarks.loadtest --app-env EXPLANATION_CACHE_SIZE=0 --app-env LLM_MAX_CONCURRENCY=4
+
+Reports throughput, p50/p95/p99 latency, errors and Ollama calls per request.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.fake_ollama import add_fake_ollama_arguments, fake_from_arguments, start_fake_ollama
+from benchmarks.synthetic import generate_conversation, generate_lexicon
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def start_app(port: int, ollama_url: str, workers: int, extra_env: Dict[str, str]) -> subprocess.Popen:
+    """
+    Run app.main:app under uvicorn in a subprocess using the fake Ollama
+    """
+    env = {**os.environ, "OLLAMA_BASE_URL": ollama_url, **extra_env}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_until_up(session: aiohttp.ClientSession, base_url: str, timeout: float = 30) -> None:
+    # /ready, not /, so model warm-up isn't counted in the measured latencies
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/ready") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"App did not come up at {base_url} within {timeout}s")
+
+
+class LoadDriver:
+    """
+    Sends requests and records per-request latency and status
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str, texts: List[str], seed: int):
+        self.session = session
+        self.url = url
+        self.texts = texts
+        self.rng = random.Random(seed)
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    async def one_request(self) -> None:
+        text = self.rng.choice(self.texts)
+        started = time.perf_counter()
+        try:
+            async with self.session.post(self.url, json={"text": text}) as response:
+                await response.read()
+                status = str(response.status)
+        except Exception as e:
+            status = type(e).__name__
+        self.latencies.append(time.perf_counter() - started)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def closed_loop(self, concurrency: int, duration: float) -> None:
+        deadline = time.monotonic() + duration
+
+        async def worker() -> None:
+            while time.monotonic() < deadline:
+                await self.one_request()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, rps: float, duration: float) -> None:
+        # Poisson arrivals at the target rate, regardless of response times
+        deadline = time.monotonic() + duration
+        tasks = []
+        while time.monotonic() < deadline:
+            tasks.append(asyncio.ensure_future(self.one_request()))
+            await asyncio.sleep(self.rng.expovariate(rps))
+        await asyncio.gather(*tasks)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = fake_from_arguments(args)
+    fake_port = _free_port()
+    runner = await start_fake_ollama(fake, "127.0.0.1", fake_port)
+
+    app_port = _free_port()
+    extra_env = dict(item.split("=", 1) for item in args.app_env)
+    process = start_app(app_port, f"http://127.0.0.1:{fake_port}", args.workers, extra_env)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    lexicon = generate_lexicon(args.lexicon_size, seed=args.seed)
+    texts = [
+        generate_conversation(args.text_size, lexicon, args.density, seed=args.seed + index)
+        for index in range(args.distinct_texts)
+    ]
+
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await wait_until_up(session, base_url)
+            driver = LoadDriver(session, base_url + args.endpoint, texts, args.seed)
+
+            if args.warmup > 0:
+                await driver.closed_loop(max(1, args.concurrency or 1), args.warmup)
+                driver.latencies.clear()
+                driver.statuses.clear()
+
+            calls_before = fake.calls
+            started = time.monotonic()
+            if args.rps:
+                await driver.open_loop(args.rps, args.duration)
+            else:
+                await driver.closed_loop(args.concurrency, args.duration)
+            elapsed = time.monotonic() - started
+            ollama_calls = fake.calls - calls_before
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        await runner.cleanup()
+
+    requests = len(driver.latencies)
+    successes = driver.statuses.get("200", 0)
+    return {
+        "config": {
+            "endpoint": args.endpoint,
+            "mode": f"rps={args.rps}" if args.rps else f"concurrency={args.concurrency}",
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "text_size": args.text_size,
+            "density": args.density,
+            "latency": f"{args.latency}(mean={args.latency_mean}, sigma={args.latency_sigma})",
+            "error_rate": args.error_rate,
+            "app_env": extra_env,
+        },
+        "requests": requests,
+        "statuses": driver.statuses,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "success_rps": successes / elapsed if elapsed else 0.0,
+        "latency_s": {
+            "p50": _percentile(driver.latencies, 50),
+            "p95": _percentile(driver.latencies, 95),
+            "p99": _percentile(driver.latencies, 99),
+            "max": max(driver.latencies) if driver.latencies else None,
+        },
+        "ollama_calls": ollama_calls,
+        "ollama_calls_per_request": ollama_calls / requests if requests else 0.0,
+        "ollama_max_in_flight": fake.max_in_flight,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the SAFESPELL API against a fake Ollama server")
+    parser.add_argument("--endpoint", default="/analyze")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=16, help="closed loop: requests kept in flight")
+    load.add_argument("--rps", type=float, help="open loop: target requests per second")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--text-size", type=int, default=600, help="characters per request text")
+    parser.add_argument("--density", type=float, default=0.3, help="fraction of lines containing a flagged phrase")
+    parser.add_argument("--lexicon-size", type=int, default=51)
+    parser.add_argument("--distinct-texts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="extra environment for the app")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    add_fake_ollama_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.rps:
+        args.concurrency = None
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Microbenchmarks for the detection hot path: get_abusive_phrases,
+analyze_text and routes.detect_keywords, over seeded synthetic
+conversations of varying size, lexicon size and match density.
+
+Run from the backend directory:
+
+    python -m benchmarks.matcher_bench --profile quick --output bench.json
+    python -m benchmarks.matcher_bench --compare bench.json --threshold 0.25
+
+Results are written as JSON with per-case timings and peak memory. With
+--compare the run exits with status 1 if any case is slower than the
+baseline by more than the threshold, or if a baseline case was not run.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# routes.py lives in the backend directory and imports the app package
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.dirname(BACKEND_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from app.models.abusive_language import ABUSIVE_PHRASES, analyze_text, get_abusive_phrases
+from app.models.lexicon import Lexicon, set_lexicon
+from benchmarks.synthetic import generate_conversation, generate_lexicon
+
+KB = 1024
+MB = 1024 * KB
+
+PROFILES = {
+    "quick": {
+        "sizes": [1 * KB, 100 * KB, 1 * MB],
+        "lexicon_sizes": [50, 5000],
+        "densities": [0.01, 0.1],
+        "lexicon_text_size": 100 * KB,
+        "density_text_size": 100 * KB,
+    },
+    "full": {
+        "sizes": [1 * KB, 100 * KB, 1 * MB, 10 * MB, 50 * MB],
+        "lexicon_sizes": [50, 500, 5000, 50000],
+        "densities": [0.001, 0.01, 0.1],
+        "lexicon_text_size": 1 * MB,
+        "density_text_size": 1 * MB,
+    },
+}
+
+DEFAULT_DENSITY = 0.01
+TARGETS = ["get_abusive_phrases", "analyze_text", "detect_keywords"]
+
+
+def _detect_keywords() -> Callable[[str], Any]:
+    # Imported lazily: routes pulls in FastAPI and the OpenAI SDK
+    from backend.routes import detect_keywords
+    return detect_keywords
+
+
+@contextmanager
+def _lexicon(phrases: List[str]) -> Iterator[None]:
+    """
+    Temporarily run the targets against another lexicon
+    """
+    original = set_lexicon(Lexicon.from_phrases(phrases, source="benchmark"))
+    try:
+        yield
+    finally:
+        set_lexicon(original)
+
+
+def build_cases(profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Size, density and lexicon-size sweeps for every target
+    """
+    default_lexicon = len(ABUSIVE_PHRASES)
+    cases = []
+    for target in TARGETS:
+        for size in profile["sizes"]:
+            cases.append({"target": target, "size": size, "lexicon_size": default_lexicon, "density": DEFAULT_DENSITY})
+        for density in profile["densities"]:
+            cases.append({"target": target, "size": profile["density_text_size"], "lexicon_size": default_lexicon, "density": density})
+    for target in TARGETS:
+        for lexicon_size in profile["lexicon_sizes"]:
+            cases.append({"target": target, "size": profile["lexicon_text_size"], "lexicon_size": lexicon_size, "density": DEFAULT_DENSITY})
+
+    unique = {}
+    for case in cases:
+        case["name"] = f"{case['target']}/size={case['size']}/lexicon={case['lexicon_size']}/density={case['density']}"
+        unique.setdefault(case["name"], case)
+    return list(unique.values())
+
+
+def run_case(case: Dict[str, Any], repeat: int, seed: int) -> Dict[str, Any]:
+    lexicon = generate_lexicon(case["lexicon_size"], seed=seed)
+    text = generate_conversation(case["size"], lexicon, case["density"], seed=seed)
+    func = {
+        "get_abusive_phrases": get_abusive_phrases,
+        "analyze_text": analyze_text,
+        "detect_keywords": _detect_keywords(),
+    }[case["target"]]
+
+    with _lexicon(lexicon):
+        # Big inputs are timed once; small ones repeatedly to reduce noise
+        runs = repeat if case["size"] <= 1 * MB else 1
+        timings = []
+        for _ in range(runs):
+            gc.collect()
+            started = time.perf_counter()
+            result = func(text)
+            timings.append(time.perf_counter() - started)
+
+        # Separate run for memory: tracemalloc slows execution down
+        gc.collect()
+        tracemalloc.start()
+        func(text)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    if isinstance(result, dict):
+        matches = len(result["flagged_phrases"])
+    else:
+        matches = len(result)
+    median = statistics.median(timings)
+    return {
+        **case,
+        "runs": runs,
+        "min_s": min(timings),
+        "median_s": median,
+        "mb_per_s": (case["size"] / MB) / median if median else None,
+        "peak_memory_bytes": peak,
+        "matches": matches,
+    }
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float, min_delta: float, name_filter: str = ""
+) -> List[str]:
+    """
+    Return a description of every case whose median time regressed past the
+    threshold (and by more than min_delta seconds) against the baseline, and
+    of every baseline case (among those selected by name_filter) that was
+    not run. Cases new since the baseline are reported but not failures.
+    """
+    previous = {case["name"]: case for case in baseline.get("cases", [])}
+    current = {case["name"] for case in results}
+    regressions = []
+    for case in results:
+        old = previous.get(case["name"])
+        if old is None:
+            print(f"{'NEW':>10}  {'':>7}  {case['name']}")
+            continue
+        ratio = case["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        status = "ok"
+        if ratio > 1 + threshold and case["median_s"] - old["median_s"] > min_delta:
+            status = "REGRESSION"
+            regressions.append(f"{case['name']}: {old['median_s']:.6f}s -> {case['median_s']:.6f}s ({ratio:.2f}x)")
+        print(f"{status:>10}  {ratio:6.2f}x  {case['name']}")
+    # A renamed case (e.g. the default lexicon grew) would otherwise drop out
+    # of the comparison unnoticed
+    for name in previous:
+        if name_filter in name and name not in current:
+            print(f"{'MISSING':>10}  {'':>7}  {name}")
+            regressions.append(f"{name}: in the baseline but not run")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the SAFESPELL detection hot path")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (inputs up to 1 MB)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this string")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in build_cases(PROFILES[args.profile]) if args.filter in case["name"]]
+    results = []
+    for case in cases:
+        result = run_case(case, args.repeat, args.seed)
+        results.append(result)
+        print(f"{result['median_s']:10.6f}s  {result['peak_memory_bytes'] / MB:8.2f} MB  {result['matches']:8d} matches  {case['name']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "profile": args.profile,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta, args.filter)
+        if regressions:
+            print("Performance regressions or missing cases:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import random
+from typing import List
+
+from app.models.abusive_language import ABUSIVE_PHRASES
+
+# Benign lines used as filler between flagged phrases
+BENIGN_SENTENCES = [
+    "Can you pick up some groceries on the way home",
+    "I had a long day at work and I'm pretty tired",
+    "Let's watch a movie tonight if you're free",
+    "Did you remember to call your mom back",
+    "The weather is supposed to be nice this weekend",
+    "I'm running a little late, sorry about that",
+    "Thanks for helping me with the dishes earlier",
+    "What do you want to do for dinner",
+    "I think we should talk about the trip next month",
+    "Your sister sent a photo of the new puppy",
+    "I left the keys on the kitchen counter",
+    "Can we go to bed a bit earlier tonight",
+]
+
+SPEAKERS = ["Person A", "Person B"]
+
+VOCABULARY = [
+    "you", "you're", "always", "never", "really", "so", "just", "me", "my", "your",
+    "fault", "stupid", "lazy", "selfish", "dramatic", "crazy", "sensitive", "wrong",
+    "nobody", "everyone", "again", "stop", "being", "acting", "like", "a", "child",
+    "ridiculous", "pathetic", "ungrateful", "useless", "embarrassing", "lucky", "owe",
+]
+
+
+def generate_lexicon(size: int, seed: int = 0) -> List[str]:
+    """
+    Return `size` distinct phrases: the built-in ABUSIVE_PHRASES first, then
+    seeded synthetic phrases of 2 to 6 words
+    """
+    rng = random.Random(seed)
+    lexicon = list(dict.fromkeys(ABUSIVE_PHRASES))[:size]
+    seen = set(lexicon)
+    while len(lexicon) < size:
+        phrase = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 6)))
+        if phrase not in seen:
+            seen.add(phrase)
+            lexicon.append(phrase)
+    return lexicon
+
+
+def generate_conversation(size_bytes: int, lexicon: List[str], density: float, seed: int = 0) -> str:
+    """
+    Return a seeded chat transcript of about `size_bytes` characters. Each
+    line contains a lexicon phrase with probability `density`.
+    """
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        sentence = rng.choice(BENIGN_SENTENCES)
+        if rng.random() < density:
+            phrase = rng.choice(lexicon)
+            if rng.random() < 0.3:
+                phrase = phrase.capitalize()
+            sentence = f"{sentence}, {phrase}" if rng.random() < 0.5 else f"{phrase}. {sentence}"
+        line = f"{SPEAKERS[len(lines) % 2]}: {sentence}."
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:size_bytes]
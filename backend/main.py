@@ -1,13 +1,31 @@
 # Placeholder for main.py 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import os
+import sys
+
+# routes.py uses the app package next to this file; make it importable as
+# "app" when this module is loaded as backend.main (e.g. uvicorn backend.main:app)
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+if _BACKEND_DIR not in sys.path:
+    sys.path.insert(0, _BACKEND_DIR)
+
 from .routes import router as api_router
+from app.utils.http_client import close_http_clients
 import uvicorn
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the pooled AI client shared by all requests
+    await close_http_clients()
+
 app = FastAPI(
     title="SAFESPELL API",
     description="API for detecting and explaining emotionally manipulative language.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
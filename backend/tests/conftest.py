@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Tests import the app package from the backend directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# ...and the legacy backend.main / backend.routes modules from the repository root
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
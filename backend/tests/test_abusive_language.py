@@ -0,0 +1,43 @@
+import pytest
+
+from app.models.abusive_language import ABUSIVE_PHRASES, calculate_severity_score, get_abusive_phrases
+from app.models.lexicon import Lexicon, LexiconEntry, get_lexicon, set_lexicon
+
+
+@pytest.fixture(autouse=True)
+def restore_lexicon():
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    yield
+    set_lexicon(previous)
+
+
+def test_overlapping_keywords_are_not_in_the_lexicon():
+    phrases = get_abusive_phrases("I told you. You never listen, and you always make me laugh.")
+    assert [item["phrase"] for item in phrases] == ["You never listen"]
+
+
+def test_detect_keywords_keeps_the_original_keywords():
+    from backend.routes import detect_keywords
+
+    text = (
+        "Well, it's your fault. Don't be dramatic. I was just joking. Everyone knows. "
+        "I'm the victim here. You always do this. You never call. Nice weather"
+    )
+    assert sorted(detect_keywords(text)) == sorted([
+        "Well, it's your fault", "Don't be dramatic", "I was just joking", "Everyone knows",
+        "I'm the victim here", "You always do this", "You never call"
+    ])
+
+
+def test_lexicon_severity_sets_phrase_severity_and_score():
+    entries = [LexiconEntry("you're worthless", severity=5), LexiconEntry("you never")]
+    set_lexicon(Lexicon(entries, "test", "test"))
+    text = "You never listen. You're worthless."
+    phrases = get_abusive_phrases(text)
+    assert [item.get("severity") for item in phrases] == [None, 5]
+    assert calculate_severity_score(phrases) == 5
+    assert calculate_severity_score(phrases[:1]) == 2
+
+    scanner = get_lexicon().matcher.scanner(get_lexicon().severities)
+    scanned = scanner.feed(text) + scanner.close()
+    assert scanned == phrases
@@ -0,0 +1,76 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+
+
+@pytest.fixture
+def client(monkeypatch):
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    monkeypatch.setattr(main, "get_prescreen_model", lambda: None)
+    yield TestClient(main.app)
+    set_lexicon(previous)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def get_gpt_explanation(phrase):
+        calls.append(phrase)
+        return f"About {phrase.lower()}."
+
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    return calls
+
+
+def test_each_unique_phrase_is_explained_once(client, calls):
+    texts = [
+        "You're overreacting.",
+        "Honestly, YOU'RE OVERREACTING again. You're too sensitive.",
+        "Nothing to see here.",
+    ]
+    response = client.post("/analyze/batch", json={"texts": texts})
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["unique_phrases"] == 2
+    assert sorted(calls) == ["You're overreacting", "You're too sensitive"]
+    results = [item["result"] for item in body["results"]]
+    assert [item["index"] for item in body["results"]] == [0, 1, 2]
+    assert results[1]["flagged_phrases"][0]["phrase"] == "YOU'RE OVERREACTING"
+    assert results[1]["flagged_phrases"][0]["explanation"] == results[0]["flagged_phrases"][0]["explanation"]
+    assert results[1]["original_text"] == texts[1]
+    assert results[2]["flagged_phrases"] == [] and results[2]["severity_score"] == 1
+
+
+def test_bad_documents_get_an_error_without_failing_the_batch(client, calls, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_TEXT_LENGTH", 50)
+    texts = ["You're overreacting.", "   ", "You're too sensitive. " * 5]
+    body = client.post("/analyze/batch", json={"texts": texts}).json()
+
+    assert body["results"][0]["result"]["flagged_phrases"]
+    assert body["results"][1] == {"index": 1, "result": None, "error": "Text cannot be empty"}
+    assert body["results"][2]["error"].startswith("Text too long")
+    assert calls == ["You're overreacting"]
+
+
+def test_failed_explanations_fall_back_per_phrase(client, monkeypatch):
+    async def get_gpt_explanation(phrase):
+        if "sensitive" in phrase:
+            raise RuntimeError("LLM down")
+        return "Dismissive."
+
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    body = client.post("/analyze/batch", json={"texts": ["You're overreacting. You're too sensitive."]}).json()
+    explanations = [item["explanation"] for item in body["results"][0]["result"]["flagged_phrases"]]
+    assert explanations == ["Dismissive.", main.FALLBACK_EXPLANATION]
+
+
+def test_batch_limits(client, calls, monkeypatch):
+    assert client.post("/analyze/batch", json={"texts": []}).status_code == 400
+    monkeypatch.setattr(main, "BATCH_MAX_TEXTS", 2)
+    assert client.post("/analyze/batch", json={"texts": ["a", "b", "c"]}).status_code == 413
+    assert calls == []
@@ -0,0 +1,92 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+from app.utils import llm_provider
+from app.utils.llm_provider import ResilientProvider, StaticProvider
+from app.utils.response_cache import ResponseCache
+
+TEXT = "Honestly, you're overreacting."
+
+
+@pytest.fixture
+def client(monkeypatch):
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    monkeypatch.setattr(main, "response_cache", ResponseCache(max_bytes=1_000_000))
+    monkeypatch.setattr(main, "get_prescreen_model", lambda: None)
+    yield TestClient(main.app)
+    set_lexicon(previous)
+
+
+def explain_with(monkeypatch, explanation):
+    calls = []
+
+    async def get_gpt_explanation(phrase):
+        calls.append(phrase)
+        return explanation
+
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    return calls
+
+
+def test_switching_mode_keeps_cached_responses(client, monkeypatch):
+    calls = explain_with(monkeypatch, "Dismisses the other person's feelings.")
+
+    async def get_document_explanations(text, phrases):
+        return [{"explanation": "Dismisses the other person's feelings.", "severity": 3} for _ in phrases]
+
+    monkeypatch.setattr(main, "get_document_explanations", get_document_explanations)
+    first = client.post("/analyze?mode=per_phrase", json={"text": TEXT})
+    assert first.headers["X-Cache"] == "miss"
+    assert client.post("/analyze?mode=document", json={"text": TEXT}).headers["X-Cache"] == "miss"
+    assert client.post("/analyze?mode=per_phrase&format=compact", json={"text": TEXT}).headers["X-Cache"] == "miss"
+
+    again = client.post("/analyze?mode=per_phrase", json={"text": TEXT})
+    assert again.headers["X-Cache"] == "hit"
+    assert again.content == first.content
+    assert client.post("/analyze?mode=document", json={"text": TEXT}).headers["X-Cache"] == "hit"
+    assert len(calls) == 2
+
+
+def test_fallback_response_has_no_etag(client, monkeypatch):
+    explain_with(monkeypatch, main.FALLBACK_EXPLANATION)
+    fallback = client.post("/analyze", json={"text": TEXT})
+    assert fallback.status_code == 200
+    assert "ETag" not in fallback.headers
+    assert fallback.headers["Cache-Control"] == "no-store"
+
+    calls = explain_with(monkeypatch, "Dismisses the other person's feelings.")
+    real = client.post("/analyze", json={"text": TEXT})
+    assert real.headers["X-Cache"] == "miss"
+    assert "Cache-Control" not in real.headers
+    assert len(calls) == 1
+
+    revalidated = client.post("/analyze", json={"text": TEXT}, headers={"If-None-Match": real.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_etag_is_weak_and_star_does_not_match(client, monkeypatch):
+    explain_with(monkeypatch, "Dismisses the other person's feelings.")
+    first = client.post("/analyze", json={"text": TEXT})
+    assert first.headers["ETag"].startswith('W/"')
+
+    strong = first.headers["ETag"].removeprefix("W/")
+    assert client.post("/analyze", json={"text": TEXT}, headers={"If-None-Match": strong}).status_code == 304
+    star = client.post("/analyze", json={"text": TEXT}, headers={"If-None-Match": "*"})
+    assert star.status_code == 200
+    assert star.headers["X-Cache"] == "hit"
+
+
+def test_static_provider_responses_are_cached(client, monkeypatch):
+    monkeypatch.setattr(llm_provider, "_provider", ResilientProvider(StaticProvider()))
+    explain_with(monkeypatch, main.FALLBACK_EXPLANATION)
+    first = client.post("/analyze", json={"text": TEXT})
+    assert "ETag" in first.headers
+    assert "Cache-Control" not in first.headers
+    assert client.post("/analyze", json={"text": TEXT}).headers["X-Cache"] == "hit"
+
+    explain_with(monkeypatch, f"{main.FALLBACK_EXPLANATION} (Error: boom)")
+    errored = client.post("/analyze", json={"text": "You're too sensitive."})
+    assert "ETag" not in errored.headers
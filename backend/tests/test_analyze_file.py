@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES, get_abusive_phrases
+from app.models.lexicon import Lexicon, set_lexicon
+from app.utils.match_pool import MatchPool
+
+TEXT = "Honestly, you're overreacting. " * 200 + "You never listen."
+
+
+@pytest.fixture
+def client(monkeypatch):
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 1000)
+    yield TestClient(main.app)
+    set_lexicon(previous)
+
+
+def upload(client):
+    return client.post("/analyze/file", files={"file": ("messages.txt", TEXT.encode("utf-8"))})
+
+
+def test_chunks_scanned_in_the_pool_match_a_full_scan(client, monkeypatch):
+    pool = MatchPool(workers=1, queue_size=1, executor="thread", inline_max_chars=100)
+    monkeypatch.setattr(main, "match_pool", pool)
+    response = upload(client)
+    pool.shutdown()
+    assert response.status_code == 200
+    assert response.json()["spans"] == [{"severity": None, **item} for item in get_abusive_phrases(TEXT)]
+    assert response.json()["total_characters"] == len(TEXT)
+
+
+def test_saturated_pool_rejects_the_upload(client, monkeypatch):
+    pool = MatchPool(workers=1, queue_size=1, executor="thread", inline_max_chars=100)
+    pool.pending = 1
+    monkeypatch.setattr(main, "match_pool", pool)
+    response = upload(client)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_upload_size_is_capped(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 5000)
+    assert upload(client).status_code == 413
@@ -0,0 +1,75 @@
+import json
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+
+TEXT = "You're overreacting. You're too sensitive."
+
+
+@pytest.fixture
+def client(monkeypatch):
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    monkeypatch.setattr(main, "get_prescreen_model", lambda: None)
+    yield TestClient(main.app)
+    set_lexicon(previous)
+
+
+def ndjson_events(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_spans_come_first_then_explanations_in_completion_order(client, monkeypatch):
+    async def get_gpt_explanation(phrase):
+        # The first phrase finishes last
+        await asyncio.sleep(0.05 if "overreacting" in phrase else 0)
+        return f"About {phrase}."
+
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    response = client.post("/analyze/stream", json={"text": TEXT})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    events = ndjson_events(response)
+    assert [event["type"] for event in events] == ["spans", "explanation", "explanation", "done"]
+    spans = events[0]
+    assert [item["phrase"] for item in spans["flagged_phrases"]] == ["You're overreacting", "You're too sensitive"]
+    assert spans["severity_score"] > 0
+    assert [event["index"] for event in events[1:3]] == [1, 0]
+    assert events[1]["explanation"] == "About You're too sensitive."
+
+
+def test_failed_explanations_get_the_fallback(client, monkeypatch):
+    async def get_gpt_explanation(phrase):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    events = ndjson_events(client.post("/analyze/stream", json={"text": TEXT}))
+    explanations = [event["explanation"] for event in events if event["type"] == "explanation"]
+    assert explanations == [main.FALLBACK_EXPLANATION] * 2
+    assert events[-1] == {"type": "done"}
+
+
+def test_server_sent_events_with_tokens(client, monkeypatch):
+    async def stream_gpt_explanation(phrase):
+        for token in ("Dismisses ", "feelings."):
+            yield token
+
+    monkeypatch.setattr(main, "stream_gpt_explanation", stream_gpt_explanation)
+    response = client.post(
+        "/analyze/stream?tokens=true", json={"text": "You're overreacting."}, headers={"Accept": "text/event-stream"}
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    chunks = [chunk for chunk in response.text.split("\n\n") if chunk]
+    assert all(chunk.startswith("data: ") for chunk in chunks)
+    events = [json.loads(chunk.removeprefix("data: ")) for chunk in chunks]
+    assert [event["type"] for event in events] == ["spans", "token", "token", "explanation", "done"]
+    assert events[3]["explanation"] == "Dismisses feelings."
+
+
+def test_empty_text_is_rejected_before_streaming(client):
+    assert client.post("/analyze/stream", json={"text": "  "}).status_code == 400
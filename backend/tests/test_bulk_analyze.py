@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from app import bulk_analyze
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+
+
+@pytest.fixture(autouse=True)
+def lexicon():
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    yield
+    set_lexicon(previous)
+
+
+def test_bad_records_are_reported_without_stopping_the_run(tmp_path):
+    source = tmp_path / "messages.jsonl"
+    output = tmp_path / "results.jsonl"
+    source.write_text("\n".join([
+        '{"text": "you never listen"}',
+        '["not", "an", "object"]',
+        '{"text": 42}',
+        '{broken',
+        '{"text": null}',
+        '{"text": "that never happened"}',
+    ]) + "\n", encoding="utf-8")
+
+    assert bulk_analyze.main([str(source), str(output), "--workers", "0", "--chunk-size", "2"]) == 0
+
+    results = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4, 5]
+    assert "error" in results[1] and "error" in results[3]
+    assert results[2]["flagged_phrases"] == [] and results[4]["flagged_phrases"] == []
+    assert results[5]["flagged_phrases"][0]["phrase"] == "that never happened"
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.edit_session import EditSession
+from app.models.phrase_matcher import PhraseMatcher
+
+PHRASES = ["no no", "you're overreacting", "overreacting", "you never", "never listen", "a"]
+
+
+def test_edit_that_shifts_repeats_pairs_like_a_full_scan():
+    matcher = PhraseMatcher(["no no"])
+    session = EditSession("s", " ".join(["no"] * 11), matcher)
+    # Prepending one "no" shifts the pairing of every repeat after it
+    session.apply_edit(0, 0, "no ")
+    assert session.spans == matcher.find_all(session.text)
+    assert [(m["start_index"], m["end_index"]) for m in session.matches()] == [
+        (0, 5), (6, 11), (12, 17), (18, 23), (24, 29), (30, 35)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_edits_match_a_full_rescan(seed):
+    rng = random.Random(seed)
+    matcher = PhraseMatcher(PHRASES)
+    words = ["no", "you're", "overreacting", "you", "never", "listen", "a", "an", "No", "x"]
+    separators = [" ", " ", "  ", ", ", ".\n", ""]
+
+    def random_text(count):
+        return "".join(rng.choice(words) + rng.choice(separators) for _ in range(count))
+
+    session = EditSession("s", random_text(60), matcher)
+    for _ in range(40):
+        offset = rng.randint(0, len(session.text))
+        delete_count = rng.randint(0, min(12, len(session.text) - offset))
+        session.apply_edit(offset, delete_count, random_text(rng.randint(0, 3)))
+        assert session.spans == matcher.find_all(session.text)
+
+
+def test_rejected_edit_leaves_the_session_unchanged():
+    matcher = PhraseMatcher(PHRASES)
+    session = EditSession("s", "you never listen", matcher)
+    before = (session.text, list(session.spans))
+    with pytest.raises(ValueError):
+        session.apply_edits([(0, 0, "Well "), (9999, 0, "")])
+    assert (session.text, session.spans) == before
+
+
+def test_matches_carry_the_lexicon_severity():
+    matcher = PhraseMatcher(["you never", "no no"])
+    session = EditSession("s", "no no, you never", matcher, severities=[4, None])
+    assert [item.get("severity") for item in session.matches()] == [None, 4]
+
+
+def test_edits_endpoint_is_all_or_nothing(monkeypatch):
+    async def get_gpt_explanation(phrase):
+        return "Dismisses the other person's feelings."
+
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    client = TestClient(main.app)
+    created = client.post("/sessions", json={"text": "I said you're overreacting"}).json()
+    url = f"/sessions/{created['session_id']}/edits"
+    bad = [{"offset": 0, "delete_count": 0, "insert_text": "Well "}, {"offset": 9999, "delete_count": 0, "insert_text": ""}]
+    assert client.post(url, json={"edits": bad}).status_code == 400
+    assert client.post(url, json={"edits": []}).json()["spans"] == created["spans"]
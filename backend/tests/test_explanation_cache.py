@@ -0,0 +1,123 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.utils.explanation_cache import ExplanationCache
+
+KEY = ("you're overreacting", "llama3.2", "v1")
+
+
+def counting_factory(calls, value="explanation", delay=0.0):
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+    return factory
+
+
+def test_concurrent_misses_run_the_factory_once():
+    async def scenario():
+        cache, calls = ExplanationCache(), []
+        results = await asyncio.gather(*(cache.get_or_create(KEY, counting_factory(calls, delay=0.01)) for _ in range(5)))
+        assert results == ["explanation"] * 5
+        assert len(calls) == 1
+        assert (cache.misses, cache.coalesced) == (1, 4)
+
+        assert await cache.get_or_create(KEY, counting_factory(calls)) == "explanation"
+        assert len(calls) == 1 and cache.hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_not_cached():
+    async def scenario():
+        cache, calls = ExplanationCache(), []
+
+        async def failing():
+            raise RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_create(KEY, failing)
+        assert await cache.get_or_create(KEY, counting_factory(calls)) == "explanation"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_memory_entries_expire_after_the_ttl():
+    async def scenario():
+        cache, calls = ExplanationCache(ttl=0.05), []
+        await cache.get_or_create(KEY, counting_factory(calls))
+        assert cache.get(KEY) == "explanation"
+        await asyncio.sleep(0.06)
+        assert cache.get(KEY) is None
+        await cache.get_or_create(KEY, counting_factory(calls))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_hits_are_promoted_to_memory(tmp_path):
+    db_path = str(tmp_path / "explanations.sqlite3")
+
+    async def scenario():
+        writer, calls = ExplanationCache(db_path=db_path), []
+        await writer.get_or_create(KEY, counting_factory(calls))
+        writer.close()
+
+        # Another worker sharing the file
+        reader = ExplanationCache(db_path=db_path)
+        assert reader.get(KEY) is None
+        assert await reader.get_or_create(KEY, counting_factory(calls, "other")) == "explanation"
+        assert len(calls) == 1 and reader.disk_hits == 1
+        assert reader.get(KEY) == "explanation"
+        reader.close()
+
+    asyncio.run(scenario())
+
+
+def _age_rows(db_path, seconds):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE explanations SET created_at = created_at - ?", (seconds,))
+
+
+def _row_count(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+
+
+def test_expired_sqlite_rows_are_pruned(tmp_path):
+    db_path = str(tmp_path / "explanations.sqlite3")
+
+    async def scenario():
+        cache, calls = ExplanationCache(ttl=60, db_path=db_path), []
+        await cache.get_or_create(KEY, counting_factory(calls))
+        await cache.get_or_create(("other phrase", "llama3.2", "v1"), counting_factory(calls))
+        _age_rows(db_path, 120)
+
+        # On access: the expired row is dropped, not returned
+        cache.clear()
+        assert await asyncio.to_thread(cache._store.get, "\x1f".join(KEY), cache.ttl) is None
+        assert _row_count(db_path) == 1
+        cache.close()
+
+        # At startup: every expired row goes
+        ExplanationCache(ttl=60, db_path=db_path).close()
+        assert _row_count(db_path) == 0
+
+    asyncio.run(scenario())
+
+
+def test_fresh_sqlite_rows_survive_startup(tmp_path):
+    db_path = str(tmp_path / "explanations.sqlite3")
+
+    async def scenario():
+        cache = ExplanationCache(ttl=60, db_path=db_path)
+        await cache.get_or_create(KEY, counting_factory([]))
+        cache.close()
+        _age_rows(db_path, 30)
+        ExplanationCache(ttl=60, db_path=db_path).close()
+        assert _row_count(db_path) == 1
+
+    asyncio.run(scenario())
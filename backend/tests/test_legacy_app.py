@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+
+
+def test_legacy_app_imports_as_backend_main():
+    # The way `uvicorn backend.main:app` loads it, from the repository root
+    result = subprocess.run(
+        [sys.executable, "-c", "import backend.main; print(backend.main.app.title)"],
+        cwd=REPO_DIR, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "SAFESPELL API"
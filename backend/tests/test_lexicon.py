@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+
+
+@pytest.fixture
+def client():
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    yield TestClient(main.app)
+    set_lexicon(previous)
+
+
+def test_reload_is_disabled_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    response = client.post("/lexicon/reload", headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
+    assert "disabled" in response.json()["detail"]
+
+
+def test_reload_requires_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    assert client.post("/lexicon/reload").status_code == 403
+    assert client.post("/lexicon/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.post("/lexicon/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["phrases"] == len(ABUSIVE_PHRASES)
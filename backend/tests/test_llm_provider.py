@@ -0,0 +1,172 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+from app.utils.llm_provider import (
+    LLMProvider, OllamaProvider, ResilientProvider, StaticProvider, CircuitBreaker, CircuitOpenError,
+    ProviderError, build_provider, FALLBACK_EXPLANATION
+)
+
+
+class SlowProvider(LLMProvider):
+    """
+    Answers after `delay` seconds; records calls that were started and cancelled
+    """
+
+    name = "slow"
+
+    def __init__(self, delay: float, text: str = "answer", endpoint: str = ""):
+        super().__init__("model", endpoint)
+        self.delay = delay
+        self.text = text
+        self.started = 0
+        self.cancelled = 0
+
+    async def complete(self, prompt, system, max_tokens=150, json_schema=None):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.text
+
+
+class FailingProvider(LLMProvider):
+    """
+    Fails every call immediately
+    """
+
+    name = "failing"
+
+    def __init__(self, endpoint: str = ""):
+        super().__init__("model", endpoint)
+        self.calls = 0
+
+    async def complete(self, prompt, system, max_tokens=150, json_schema=None):
+        self.calls += 1
+        raise ProviderError("connection refused")
+
+
+def test_circuit_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    # Only one probe at a time; a failed probe opens it again straight away
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_open_breaker_fails_fast_without_calling_the_backend():
+    async def scenario():
+        primary = FailingProvider()
+        provider = ResilientProvider(primary, breaker_failures=2, breaker_reset=60, timeout=0)
+        for _ in range(2):
+            with pytest.raises(ProviderError):
+                await provider.complete("prompt", "system")
+        with pytest.raises(CircuitOpenError):
+            await provider.complete("prompt", "system")
+        assert primary.calls == 2
+        assert provider.breaker_states() == {primary.backend_id: "open"}
+
+    asyncio.run(scenario())
+
+
+def test_fast_primary_is_not_hedged():
+    async def scenario():
+        primary, hedge = SlowProvider(0.01, "primary", endpoint="a"), SlowProvider(0, "hedge", endpoint="b")
+        provider = ResilientProvider(primary, hedge, hedge_delay=0.1, timeout=0)
+        assert await provider.complete("prompt", "system") == "primary"
+        assert hedge.started == 0
+
+    asyncio.run(scenario())
+
+
+def test_slow_primary_is_hedged_after_the_delay():
+    async def scenario():
+        primary, hedge = SlowProvider(1, "primary", endpoint="a"), SlowProvider(0.01, "hedge", endpoint="b")
+        provider = ResilientProvider(primary, hedge, hedge_delay=0.05, timeout=0)
+        started = time.perf_counter()
+        call = asyncio.create_task(provider.complete("prompt", "system"))
+        await asyncio.sleep(0.02)
+        assert (primary.started, hedge.started) == (1, 0)
+
+        assert await call == "hedge"
+        assert 0.05 <= time.perf_counter() - started < 0.5
+        # The losing call does not keep running
+        await asyncio.sleep(0)
+        assert primary.cancelled == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_primary_is_hedged_without_waiting_for_the_delay():
+    async def scenario():
+        hedge = SlowProvider(0, "hedge", endpoint="b")
+        provider = ResilientProvider(FailingProvider(endpoint="a"), hedge, hedge_delay=1, timeout=0)
+        started = time.perf_counter()
+        assert await provider.complete("prompt", "system") == "hedge"
+        assert time.perf_counter() - started < 0.5
+
+    asyncio.run(scenario())
+
+
+def test_static_hedge_answers_when_the_llm_is_down():
+    async def scenario():
+        primary = FailingProvider()
+        provider = ResilientProvider(primary, StaticProvider(), hedge_delay=1, timeout=0, breaker_failures=1)
+        assert await provider.complete("prompt", "system") == FALLBACK_EXPLANATION
+        structured = json.loads(await provider.complete("prompt", "system", json_schema={"type": "object"}))
+        assert structured == {"explanation": FALLBACK_EXPLANATION, "severity": 3}
+        # With the primary's breaker open, the static backend answers alone
+        assert primary.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_during_the_hedge_delay_cancels_the_primary_call():
+    async def scenario():
+        primary, hedge = SlowProvider(10, endpoint="a"), SlowProvider(10, endpoint="b")
+        provider = ResilientProvider(primary, hedge, hedge_delay=5, timeout=0)
+        call = asyncio.create_task(provider.complete("prompt", "system"))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert (primary.started, primary.cancelled) == (1, 1)
+        assert hedge.started == 0
+        # The hedge backend's breaker is free for the next call
+        assert provider.breakers[hedge.backend_id]._probing is False
+
+    asyncio.run(scenario())
+
+
+def test_hedge_on_another_host_of_the_same_model_has_its_own_breaker():
+    primary = build_provider("ollama", "http://ollama-1:11434", "llama3.2")
+    hedge = build_provider("ollama", "http://ollama-2:11434", "llama3.2")
+    assert isinstance(hedge, OllamaProvider) and hedge.base_url == "http://ollama-2:11434"
+    assert primary.model_id == hedge.model_id
+    provider = ResilientProvider(primary, hedge)
+    assert set(provider.breaker_states()) == {primary.backend_id, hedge.backend_id}
@@ -0,0 +1,155 @@
+import time
+import asyncio
+
+from app.utils.llm_scheduler import LLMScheduler, set_request_lane, BULK, INTERACTIVE
+
+
+async def _queue(scheduler, order, name, lane, client="", key=None):
+    """
+    Start a call for `client` in `lane` that records `name` when it runs
+    """
+    async def call():
+        set_request_lane(lane, client)
+
+        async def factory():
+            order.append(name)
+            return name
+
+        return await scheduler.run(factory, key=key)
+
+    task = asyncio.create_task(call())
+    # Let it reach the queue before the next one is started
+    await asyncio.sleep(0)
+    return task
+
+
+async def _holding(scheduler, released):
+    """
+    Occupy a slot until `released` is set
+    """
+    async def factory():
+        await released.wait()
+
+    task = asyncio.create_task(scheduler.run(factory))
+    await asyncio.sleep(0)
+    return task
+
+
+def test_interactive_calls_go_first_but_bulk_is_not_starved():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, interactive_weight=2, batch_window=0)
+        released, order = asyncio.Event(), []
+        blocker = await _holding(scheduler, released)
+        tasks = [await _queue(scheduler, order, name, BULK) for name in ("b1", "b2")]
+        tasks += [await _queue(scheduler, order, name, INTERACTIVE) for name in ("i1", "i2", "i3")]
+        assert scheduler.stats()["lanes"][BULK]["depth"] == 2
+
+        released.set()
+        await asyncio.gather(blocker, *tasks)
+        assert order == ["i1", "i2", "b1", "i3", "b2"]
+        assert scheduler.outstanding == 0
+
+    asyncio.run(scenario())
+
+
+def test_clients_take_turns_within_a_lane():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, batch_window=0)
+        released, order = asyncio.Event(), []
+        blocker = await _holding(scheduler, released)
+        tasks = [await _queue(scheduler, order, name, BULK, client="a") for name in ("a1", "a2", "a3")]
+        tasks += [await _queue(scheduler, order, name, BULK, client="b") for name in ("b1", "b2")]
+        assert scheduler.stats()["lanes"][BULK]["clients"] == 2
+
+        released.set()
+        await asyncio.gather(blocker, *tasks)
+        assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+    asyncio.run(scenario())
+
+
+def test_identical_keyed_calls_share_one_result():
+    async def scenario():
+        scheduler = LLMScheduler(batch_window=0)
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "explanation"
+
+        results = await asyncio.gather(*(scheduler.run(factory, key="phrase") for _ in range(5)))
+        assert results == ["explanation"] * 5
+        assert len(calls) == 1
+
+        # Once finished, the same key runs again
+        assert await scheduler.run(factory, key="phrase") == "explanation"
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_merged_failures_reach_every_caller():
+    async def scenario():
+        scheduler = LLMScheduler(batch_window=0)
+
+        async def factory():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("down")
+
+        results = await asyncio.gather(*(scheduler.run(factory, key="phrase") for _ in range(3)), return_exceptions=True)
+        assert [str(result) for result in results] == ["down"] * 3
+
+    asyncio.run(scenario())
+
+
+def test_interactive_caller_promotes_a_queued_bulk_call():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, batch_window=0)
+        released, order = asyncio.Event(), []
+        blocker = await _holding(scheduler, released)
+        other = await _queue(scheduler, order, "other", BULK)
+        shared = await _queue(scheduler, order, "shared", BULK, key="phrase")
+        joined = await _queue(scheduler, order, "joined", INTERACTIVE, key="phrase")
+        assert scheduler.stats()["lanes"][INTERACTIVE]["depth"] == 1
+
+        released.set()
+        await asyncio.gather(blocker, other, shared, joined)
+        assert order == ["shared", "other"]
+        assert joined.result() == "shared"
+
+    asyncio.run(scenario())
+
+
+def test_calls_arriving_within_the_batch_window_are_merged():
+    async def scenario():
+        scheduler = LLMScheduler(batch_window=0.05)
+        started = []
+
+        async def factory():
+            started.append(time.perf_counter())
+            return "explanation"
+
+        begin = time.perf_counter()
+        first = asyncio.create_task(scheduler.run(factory, key="phrase"))
+        await asyncio.sleep(0.01)
+        # A fast call would have finished by now without the window
+        assert not started
+        second = asyncio.create_task(scheduler.run(factory, key="phrase"))
+        assert await asyncio.gather(first, second) == ["explanation", "explanation"]
+        assert len(started) == 1
+        assert started[0] - begin >= 0.05
+
+    asyncio.run(scenario())
+
+
+def test_unkeyed_calls_skip_the_batch_window():
+    async def scenario():
+        scheduler = LLMScheduler(batch_window=1)
+
+        async def factory():
+            return "explanation"
+
+        assert await asyncio.wait_for(scheduler.run(factory), timeout=0.5) == "explanation"
+
+    asyncio.run(scenario())
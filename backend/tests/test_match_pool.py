@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.utils.match_pool import MatchPool, MatchPoolFullError
+
+
+def test_run_counts_against_the_queue_limit():
+    async def scenario():
+        pool = MatchPool(workers=1, queue_size=1, executor="thread")
+        release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def blocking():
+            loop.call_soon_threadsafe(started.set)
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+            return "screened"
+
+        first = asyncio.create_task(pool.run(blocking))
+        await started.wait()
+        with pytest.raises(MatchPoolFullError):
+            await pool.run(len, "text")
+        with pytest.raises(MatchPoolFullError):
+            await pool.find("x" * (pool.inline_max_chars + 1))
+        release.set()
+        assert await first == "screened"
+        assert pool.pending == 0
+        assert await pool.run(len, "text") == 4
+        pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,27 @@
+from benchmarks.matcher_bench import compare
+
+
+def case(name, median_s):
+    return {"name": name, "median_s": median_s}
+
+
+def test_compare_reports_added_and_removed_cases(capsys):
+    baseline = {"cases": [case("analyze_text/lexicon=51", 0.010), case("analyze_text/lexicon=5000", 0.020)]}
+    results = [case("analyze_text/lexicon=58", 0.010), case("analyze_text/lexicon=5000", 0.021)]
+
+    regressions = compare(results, baseline, threshold=0.25, min_delta=0.001)
+
+    assert regressions == ["analyze_text/lexicon=51: in the baseline but not run"]
+    output = capsys.readouterr().out
+    assert "NEW" in output and "analyze_text/lexicon=58" in output
+    assert "MISSING" in output
+
+
+def test_compare_only_expects_cases_selected_by_the_filter():
+    baseline = {"cases": [case("analyze_text/size=1024", 0.010), case("detect_keywords/size=1024", 0.010)]}
+    results = [case("analyze_text/size=1024", 0.020)]
+
+    regressions = compare(results, baseline, threshold=0.25, min_delta=0.001, name_filter="analyze_text")
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("analyze_text/size=1024: 0.010000s -> 0.020000s")
@@ -0,0 +1,73 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+from app.utils.metrics import (
+    Counter, Histogram, format_server_timing, record_ollama_usage, start_request_timings, stage_timer,
+    OLLAMA_EVAL_TOKENS, OLLAMA_DURATIONS
+)
+from app.utils.response_cache import ResponseCache
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    counter = Counter("calls_total", "Calls", ["outcome"])
+    counter.inc(1, "ok")
+    counter.inc(2, "ok")
+    assert counter.render() == ["# HELP calls_total Calls", "# TYPE calls_total counter", 'calls_total{outcome="ok"} 3']
+
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 2.65",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_stage_timings_are_summed_per_request():
+    timings = start_request_timings()
+    for _ in range(2):
+        with stage_timer("llm_generate"):
+            pass
+    assert list(timings) == ["llm_generate"]
+    assert format_server_timing({"match": 0.0012, "total": 0.5}) == "match;dur=1.20, total;dur=500.00"
+
+
+def test_ollama_usage_is_recorded():
+    tokens = OLLAMA_EVAL_TOKENS._values.get((), 0)
+    count = lambda phase: OLLAMA_DURATIONS._values.get((phase,), [None, 0.0, 0])[2]
+    evals, loads = count("eval"), count("load")
+    record_ollama_usage({"eval_count": 42, "eval_duration": 1_500_000_000, "load_duration": "bogus"})
+    assert OLLAMA_EVAL_TOKENS._values[()] == tokens + 42
+    assert (count("eval"), count("load")) == (evals + 1, loads)
+
+
+def test_analyze_sends_server_timing_and_updates_metrics(monkeypatch):
+    async def get_gpt_explanation(phrase):
+        return "Dismissive."
+
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    try:
+        monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+        monkeypatch.setattr(main, "get_prescreen_model", lambda: None)
+        monkeypatch.setattr(main, "response_cache", ResponseCache(max_bytes=1_000_000))
+        client = TestClient(main.app)
+        response = client.post("/analyze", json={"text": "You're overreacting."})
+    finally:
+        set_lexicon(previous)
+
+    stages = dict(part.split(";dur=") for part in response.headers["Server-Timing"].split(", "))
+    assert {"match", "total"} <= set(stages)
+    assert all(float(duration) >= 0 for duration in stages.values())
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert re.search(r'^safespell_request_duration_seconds_count\{path="/analyze",status="200"\} [1-9]', metrics.text, re.M)
+    assert re.search(r'^safespell_stage_duration_seconds_count\{stage="match"\} [1-9]', metrics.text, re.M)
+    assert re.search(r"^safespell_flagged_phrases_count [1-9]", metrics.text, re.M)
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from app.models.phrase_matcher import PhraseMatcher
+
+PHRASES = ["no no", "you're overreacting", "overreacting", "you never", "never listen", "a"]
+
+
+def _spans(matcher, text):
+    return [(start, end) for start, end, _ in matcher.find_all(text)]
+
+
+def _scan_in_chunks(matcher, text, size):
+    scanner = matcher.scanner()
+    found = []
+    for position in range(0, len(text), size):
+        found.extend(scanner.feed(text[position:position + size]))
+    found.extend(scanner.close())
+    assert scanner.total_characters == len(text)
+    for item in found:
+        assert text[item["start_index"]:item["end_index"]] == item["phrase"]
+    return sorted((item["start_index"], item["end_index"]) for item in found)
+
+
+def test_repeated_phrase_pairs_like_a_full_scan():
+    matcher = PhraseMatcher(["no no"])
+    text = " ".join(["no"] * 11)
+    expected = [(0, 5), (6, 11), (12, 17), (18, 23), (24, 29)]
+    assert _spans(matcher, text) == expected
+    for size in (1, 2, 3, 4, 7, len(text)):
+        assert _scan_in_chunks(matcher, text, size) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunked_scan_matches_whole_text(seed):
+    rng = random.Random(seed)
+    matcher = PhraseMatcher(PHRASES)
+    words = ["no", "you're", "overreacting", "you", "never", "listen", "a", "an", "No", "NEVER", "x_y", "İ"]
+    separators = [" ", " ", "  ", ", ", ".\n", "_", ""]
+    text = "".join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randint(0, 200)))
+    expected = sorted(_spans(matcher, text))
+    for size in (1, 2, 3, 5, 8, 13, 64):
+        assert _scan_in_chunks(matcher, text, size) == expected
+
+
+def test_from_state_finds_the_same_matches():
+    matcher = PhraseMatcher(PHRASES)
+    text = "You're overreacting, you never listen. No no no."
+    assert PhraseMatcher.from_state(matcher.to_state()).find_all(text) == matcher.find_all(text)
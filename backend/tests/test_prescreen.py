@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from conftest import BACKEND_DIR
+from training import train_prescreen
+
+# The artifact shipped in the repository (PRESCREEN_MODEL_PATH may point elsewhere)
+BUNDLED_MODEL = os.path.join(BACKEND_DIR, "app", "models", "data", "prescreen.npz")
+
+
+def _version(path):
+    with np.load(path) as data:
+        return str(data["version"])
+
+
+def test_shipped_model_matches_a_fresh_training_run(tmp_path):
+    # Retrain whenever the lexicon or the training script changes
+    output = tmp_path / "prescreen.npz"
+    assert train_prescreen.main(["--output", str(output)]) == 0
+    assert _version(output) == _version(BUNDLED_MODEL)
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+from app.utils import response_format
+from app.utils.response_cache import ResponseCache
+from app.utils.response_format import (
+    build_compact_response, encode_compact, negotiate_format, COMPACT_JSON_MEDIA_TYPE
+)
+
+TEXT = "You're overreacting. Fine, YOU'RE OVERREACTING. You're too sensitive."
+
+
+def spans(*items):
+    return [
+        {"phrase": phrase, "start_index": start, "end_index": end, "severity": severity}
+        for phrase, start, end, severity in items
+    ]
+
+
+def test_compact_body_stores_each_explanation_once():
+    phrases = spans(("You're overreacting", 0, 19, 3), ("YOU'RE OVERREACTING", 27, 46, 3), ("too sensitive", 55, 68, None))
+    body = build_compact_response(phrases, ["Dismissive.", "Dismissive.", "Belittling."], [None, 4, None], 4)
+    assert body == {
+        "severity_score": 4,
+        "phrases": ["you're overreacting", "too sensitive"],
+        "explanations": ["Dismissive.", "Belittling."],
+        "starts": [0, 27, 55],
+        "ends": [19, 46, 68],
+        "ids": [0, 0, 1],
+        "severities": [3, 4, None],
+    }
+
+
+def test_occurrences_with_different_explanations_keep_their_own():
+    phrases = spans(("You're overreacting", 0, 19, None), ("you're overreacting", 30, 49, None))
+    body = build_compact_response(phrases, ["Dismissive.", "Fallback."], None, 3)
+    assert body["explanations"] == ["Dismissive.", "Fallback."]
+    assert body["ids"] == [0, 1]
+    assert body["severities"] is None
+
+
+def test_format_negotiation():
+    assert negotiate_format(None, None) == "json"
+    assert negotiate_format(f"{COMPACT_JSON_MEDIA_TYPE}, application/json", None) == "compact"
+    assert negotiate_format("application/x-msgpack", None) == "msgpack"
+    assert negotiate_format("application/msgpack", "json") == "json"
+    with pytest.raises(ValueError):
+        negotiate_format(None, "xml")
+
+
+def test_msgpack_is_only_offered_when_installed(monkeypatch):
+    monkeypatch.setattr(response_format, "msgpack", None)
+    assert negotiate_format("application/msgpack", None) == "json"
+    with pytest.raises(ValueError):
+        negotiate_format(None, "msgpack")
+
+
+def test_standard_json_fallback_encodes_the_same_body(monkeypatch):
+    body = build_compact_response(spans(("You're overreacting", 0, 19, 3)), ["Dismissive — gently."], None, 3)
+    fast, media_type = encode_compact(body, "compact")
+    monkeypatch.setattr(response_format, "orjson", None)
+    plain, _ = encode_compact(body, "compact")
+    assert media_type == COMPACT_JSON_MEDIA_TYPE
+    assert json.loads(fast) == json.loads(plain) == body
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def get_gpt_explanation(phrase):
+        return "Dismissive." if "overreacting" in phrase.lower() else "Belittling."
+
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+    monkeypatch.setattr(main, "get_prescreen_model", lambda: None)
+    monkeypatch.setattr(main, "response_cache", ResponseCache(max_bytes=1_000_000))
+    yield TestClient(main.app)
+    set_lexicon(previous)
+
+
+def test_analyze_returns_the_compact_format(client):
+    full = client.post("/analyze", json={"text": TEXT}).json()
+    response = client.post("/analyze", json={"text": TEXT}, headers={"Accept": COMPACT_JSON_MEDIA_TYPE})
+    assert response.headers["content-type"] == COMPACT_JSON_MEDIA_TYPE
+    body = response.json()
+
+    assert "original_text" not in body
+    assert body["severity_score"] == full["severity_score"]
+    assert body["explanations"] == ["Dismissive.", "Belittling."]
+    expanded = [
+        (TEXT[start:end], body["explanations"][index])
+        for start, end, index in zip(body["starts"], body["ends"], body["ids"])
+    ]
+    assert expanded == [(item["phrase"], item["explanation"]) for item in full["flagged_phrases"]]
+
+
+def test_analyze_returns_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+    compact = client.post("/analyze?format=compact", json={"text": TEXT}).json()
+    response = client.post("/analyze", json={"text": TEXT}, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == compact
+
+
+def test_unknown_format_is_not_acceptable(client):
+    assert client.post("/analyze?format=xml", json={"text": TEXT}).status_code == 406
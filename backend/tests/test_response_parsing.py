@@ -0,0 +1,58 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.lexicon import Lexicon, set_lexicon
+from app.utils.response_cache import ResponseCache
+from app.utils.response_parsing import parse_explanation, parse_explanation_list
+
+
+def test_entries_without_a_valid_severity_are_parse_failures():
+    content = json.dumps({"results": [
+        {"id": 0, "explanation": "Dismissive.", "severity": 4},
+        {"id": 1, "explanation": "Blames the listener."},
+        {"id": 2, "explanation": "Denies their memory.", "severity": 9},
+        {"id": 3, "explanation": "Mocking.", "severity": "high"},
+        {"id": 4, "explanation": "Guilt-tripping.", "severity": True},
+    ]})
+    assert parse_explanation_list(content, 5) == [{"explanation": "Dismissive.", "severity": 4}, None, None, None, None]
+
+
+def test_single_phrase_responses_still_default_the_severity():
+    assert parse_explanation('{"explanation": "Dismissive."}') == {"explanation": "Dismissive.", "severity": 3}
+
+
+def test_document_mode_retries_only_the_entry_with_a_bad_severity(monkeypatch):
+    async def get_document_explanations(text, phrases):
+        content = json.dumps({"results": [
+            {"id": 0, "explanation": "Dismisses their feelings.", "severity": 4},
+            {"id": 1, "explanation": "Calls them oversensitive.", "severity": 0},
+        ]})
+        return parse_explanation_list(content, len(phrases))
+
+    retried = []
+
+    async def get_gpt_explanation(phrase):
+        retried.append(phrase)
+        return "Retried explanation."
+
+    previous = set_lexicon(Lexicon.from_phrases(ABUSIVE_PHRASES))
+    try:
+        monkeypatch.setattr(main, "response_cache", ResponseCache(max_bytes=1_000_000))
+        monkeypatch.setattr(main, "get_prescreen_model", lambda: None)
+        monkeypatch.setattr(main, "get_document_explanations", get_document_explanations)
+        monkeypatch.setattr(main, "get_gpt_explanation", get_gpt_explanation)
+        response = TestClient(main.app).post(
+            "/analyze?mode=document", json={"text": "You're overreacting. You're too sensitive."}
+        )
+    finally:
+        set_lexicon(previous)
+
+    assert response.status_code == 200
+    assert retried == ["You're too sensitive"]
+    flagged = response.json()["flagged_phrases"]
+    assert [(item["explanation"], item["severity"]) for item in flagged] == [
+        ("Dismisses their feelings.", 4), ("Retried explanation.", None)
+    ]
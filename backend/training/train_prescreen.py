@@ -0,0 +1,258 @@
+"""
+Train the prescreen classifier (app/models/prescreen.py): logistic
+regression over hashed character n-grams, fitted with mini-batch AdaGrad in
+NumPy. Runs on CPU in a few seconds with no network access.
+
+Run from the backend directory:
+
+    python -m training.train_prescreen
+    python -m training.train_prescreen --extra my_examples.csv --output my_model.npz
+
+Without --extra the training set is generated from the built-in lexicon:
+paraphrased variants of every phrase (contractions, slang spellings,
+intensifiers, surrounding words) as positives, and benign sentences that
+reuse the same vocabulary as negatives. --extra adds labelled examples from a
+CSV file with columns text,label (label 1 = abusive, 0 = benign).
+
+A share of the lexicon phrases is held out entirely, so the reported
+validation scores measure how well the model catches phrasings it has never
+seen. The decision threshold stored with the model is the highest one that
+keeps --target-recall on that validation set, and never below
+--min-threshold.
+"""
+import os
+import sys
+import csv
+import time
+import random
+import hashlib
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.models.abusive_language import ABUSIVE_PHRASES
+from app.models.prescreen import PRESCREEN_MODEL_PATH, PrescreenModel, hash_features
+from benchmarks.synthetic import BENIGN_SENTENCES
+
+Example = Tuple[str, int]
+
+# Spelling variants substituted into lexicon phrases
+SUBSTITUTIONS = {
+    "you're": ["you're", "you are", "youre", "ur", "u r", "you r"],
+    "you'll": ["you'll", "you will", "youll", "u will"],
+    "i'm": ["i'm", "i am", "im"],
+    "i've": ["i've", "i have", "ive"],
+    "you": ["you", "u"],
+    "your": ["your", "ur", "yr"],
+    "no one": ["no one", "nobody", "noone"],
+    "everyone": ["everyone", "everybody"],
+    "never": ["never", "never ever"],
+    "always": ["always", "constantly", "forever"],
+}
+INTENSIFIERS = ["", "", "so ", "really ", "just ", "way too ", "always ", "literally "]
+PREFIXES = ["", "", "", "honestly ", "seriously ", "look, ", "omg ", "god, ", "wow ", "ugh "]
+SUFFIXES = ["", "", "", " again", " as usual", " like always", " and you know it", " lol", " for real", " right now"]
+
+# Benign sentences sharing vocabulary with the lexicon
+BENIGN_EXTRA = [
+    "you're amazing", "you are so thoughtful", "you're the best", "you're right about that",
+    "are you free tomorrow", "i'm sensitive to cold weather", "the movie was crazy good",
+    "thanks for listening to me", "i never liked that restaurant anyway",
+    "everyone agrees the concert was great", "you always make me laugh",
+    "you made my day", "look what i made for dinner", "i'm doing this for the team",
+    "no one was at the store this morning", "nobody told me the meeting moved",
+    "you deserve a break", "this is your coffee", "you need a jacket it's cold outside",
+    "i owe you one", "after all that rain the garden looks great", "you should come with us",
+    "you're welcome", "you're so kind", "i'm just trying to finish this report",
+    "you're going to love this place", "i'm proud of you", "you never know what will happen",
+    "that happened last week", "i remember it well", "i'm the only one home tonight",
+    "you're lucky the train was late", "you brought snacks, thank you", "you're making progress",
+    "you're being really patient", "you listen so well", "everyone thinks you're funny",
+    "i'm not sure what time it starts", "can you help me move on saturday",
+    "the problem was the wifi", "we should talk about the budget", "i love you",
+    "you're imagining a beach vacation right now aren't you", "you're always welcome here",
+    "i finished the report and sent it over", "let's grab lunch at noon", "do you want pizza or pasta",
+    "the bus was twenty minutes late", "my brother is visiting next week", "we need a new vacuum",
+    "i always forget where i put my glasses", "you look great in that jacket", "did you see the game",
+    "happy birthday hope you have a great day", "can you send me the photos", "the meeting went well",
+    "i'll be there in ten minutes", "don't forget your umbrella", "the kids are asleep finally",
+    "what time does the store close", "i can't find the remote", "we should plan a trip this summer",
+    "how was your day", "i'm cooking pasta tonight", "call me when you land", "the cat knocked over a plant",
+    "i never got your message", "everyone had fun at the party", "you were right about the traffic",
+]
+BENIGN_SUBJECTS = ["you're", "you are", "ur", "i'm", "we're", "they're", "she's", "he's"]
+BENIGN_PREDICATES = [
+    "so kind", "really funny", "the best", "right", "welcome", "on the way", "almost home",
+    "doing great", "so talented", "a good friend", "free this weekend", "at the store",
+    "going to love it", "back early", "such a help", "making dinner", "out of milk",
+]
+# Benign openers the lexicon also starts with, and everyday endings for them
+BENIGN_OPENERS = [
+    "you look", "you never", "you always", "i always", "i never", "nobody", "no one", "everyone",
+    "you should", "you make", "you can", "did you", "you were", "that was", "it's all",
+]
+BENIGN_ENDINGS = [
+    "nice today", "mentioned the concert", "lose my keys", "at the pool", "bring the best snacks",
+    "loves a good movie", "try the soup here", "cook on sundays", "call before noon", "liked the new song",
+    "ready for the trip", "went to the beach", "set for tomorrow", "fine in the end", "about the weather",
+    "finish the puzzle", "remember the wifi password", "visit on holidays", "came to the meeting",
+    "happy with the results", "in the kitchen", "wrong about the time", "walk the dog in the morning",
+]
+
+
+def _variants(phrase: str, rng: random.Random) -> str:
+    """
+    One random paraphrase of a lexicon phrase
+    """
+    tokens = phrase.split()
+    for source, targets in SUBSTITUTIONS.items():
+        source_tokens = source.split()
+        width = len(source_tokens)
+        for position in range(len(tokens) - width + 1):
+            if tokens[position:position + width] == source_tokens:
+                tokens[position:position + width] = rng.choice(targets).split()
+                break
+    intensifier = rng.choice(INTENSIFIERS).strip()
+    if intensifier and len(tokens) > 1:
+        tokens.insert(rng.randint(1, len(tokens) - 1), intensifier)
+    return rng.choice(PREFIXES) + " ".join(tokens) + rng.choice(SUFFIXES)
+
+
+def _benign(rng: random.Random) -> str:
+    choice = rng.random()
+    if choice < 0.35:
+        return rng.choice(BENIGN_EXTRA)
+    if choice < 0.55:
+        return rng.choice(BENIGN_SENTENCES).lower()
+    if choice < 0.75:
+        return f"{rng.choice(BENIGN_OPENERS)} {rng.choice(BENIGN_ENDINGS)}"
+    sentence = f"{rng.choice(BENIGN_SUBJECTS)} {rng.choice(INTENSIFIERS)}{rng.choice(BENIGN_PREDICATES)}"
+    return rng.choice(PREFIXES) + sentence + rng.choice(SUFFIXES)
+
+
+def build_dataset(per_phrase: int, holdout: float, seed: int) -> Tuple[List[Example], List[Example]]:
+    """
+    Generated (train, validation) examples. Validation positives come only
+    from held-out lexicon phrases.
+    """
+    rng = random.Random(seed)
+    phrases = list(ABUSIVE_PHRASES)
+    rng.shuffle(phrases)
+    split = int(len(phrases) * (1 - holdout))
+
+    train: List[Example] = []
+    validation: List[Example] = []
+    for index, phrase in enumerate(phrases):
+        target = train if index < split else validation
+        for _ in range(per_phrase):
+            target.append((_variants(phrase, rng), 1))
+
+    for target, count in ((train, len(train)), (validation, len(validation))):
+        for _ in range(count):
+            target.append((_benign(rng), 0))
+    rng.shuffle(train)
+    rng.shuffle(validation)
+    return train, validation
+
+
+def read_examples(path: str) -> List[Example]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["text"], int(row["label"])) for row in csv.DictReader(f) if row.get("text")]
+
+
+def train(examples: List[Example], bits: int, epochs: int, learning_rate: float, l2: float, batch_size: int, seed: int) -> Tuple[np.ndarray, float]:
+    """
+    Logistic regression with AdaGrad on L2-normalized hashed n-gram counts
+    """
+    rng = np.random.default_rng(seed)
+    texts = [text for text, _ in examples]
+    labels = np.array([label for _, label in examples], dtype=np.float64)
+    weights = np.zeros(1 << bits, dtype=np.float64)
+    bias = 0.0
+    weight_norm = np.full(1 << bits, 1e-8)
+    bias_norm = 1e-8
+
+    for _ in range(epochs):
+        order = rng.permutation(len(texts))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            rows, buckets = hash_features(np, [texts[i] for i in batch], bits)
+            scale = 1.0 / np.sqrt(np.maximum(np.bincount(rows, minlength=len(batch)), 1))
+            logits = bias + np.bincount(rows, weights=weights[buckets], minlength=len(batch)) * scale
+            error = 1.0 / (1.0 + np.exp(-logits)) - labels[batch]
+
+            gradient = np.zeros_like(weights)
+            np.add.at(gradient, buckets, (error * scale)[rows])
+            touched = np.unique(buckets)
+            gradient[touched] = gradient[touched] / len(batch) + l2 * weights[touched]
+            weight_norm[touched] += gradient[touched] ** 2
+            weights[touched] -= learning_rate * gradient[touched] / np.sqrt(weight_norm[touched])
+
+            bias_gradient = float(error.mean())
+            bias_norm += bias_gradient ** 2
+            bias -= learning_rate * bias_gradient / np.sqrt(bias_norm)
+    return weights.astype(np.float32), bias
+
+
+def evaluate(model: PrescreenModel, examples: List[Example], target_recall: float, min_threshold: float) -> Tuple[float, dict]:
+    """
+    Highest threshold (at least min_threshold) that still reaches
+    target_recall on examples, and the metrics at that threshold. Generated
+    negatives are easier than real conversations, so the threshold errs on
+    the side of precision.
+    """
+    scores = model.score([text for text, _ in examples])
+    labels = np.array([label for _, label in examples])
+    best = None
+    for threshold in np.linspace(min_threshold, 0.95, int(round((0.95 - min_threshold) * 100)) + 1):
+        predicted = scores >= threshold
+        true_positive = int(np.sum(predicted & (labels == 1)))
+        precision = true_positive / max(1, int(predicted.sum()))
+        recall = true_positive / max(1, int((labels == 1).sum()))
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        if best is None or recall >= target_recall:
+            best = (float(threshold), {"precision": precision, "recall": recall, "f1": f1})
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train the SAFESPELL prescreen classifier")
+    parser.add_argument("--output", default=PRESCREEN_MODEL_PATH)
+    parser.add_argument("--extra", action="append", default=[], help="CSV file of extra examples (text,label)")
+    parser.add_argument("--bits", type=int, default=16, help="log2 of the number of hashed features")
+    parser.add_argument("--per-phrase", type=int, default=200, help="generated paraphrases per lexicon phrase")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of lexicon phrases kept for validation")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--target-recall", type=float, default=0.9, help="recall on held-out phrases the threshold must keep")
+    parser.add_argument("--min-threshold", type=float, default=0.5, help="lowest threshold stored with the model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    train_set, validation_set = build_dataset(args.per_phrase, args.holdout, args.seed)
+    for path in args.extra:
+        train_set.extend(read_examples(path))
+
+    started = time.perf_counter()
+    weights, bias = train(train_set, args.bits, args.epochs, args.learning_rate, args.l2, args.batch_size, args.seed)
+    elapsed = time.perf_counter() - started
+
+    model = PrescreenModel(np, weights, bias, 0.5)
+    threshold, metrics = evaluate(model, validation_set, args.target_recall, args.min_threshold)
+    model.threshold = threshold
+    model.version = hashlib.sha256(weights.tobytes() + np.float64(bias).tobytes()).hexdigest()[:16]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    model.save(args.output)
+    print(f"Trained on {len(train_set)} examples in {elapsed:.1f}s; validation on {len(validation_set)} "
+          f"(unseen phrases): precision {metrics['precision']:.3f}, recall {metrics['recall']:.3f}, "
+          f"F1 {metrics['f1']:.3f} at threshold {threshold:.2f}", file=sys.stderr)
+    print(f"Wrote {args.output} (version {model.version})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())